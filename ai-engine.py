@@ -1,7 +1,106 @@
 import random
 import time
-from copy import deepcopy
-from chess3d import Chess3D, Position, PieceType, Color, Move
+from array import array
+from chess3d import (
+    Chess3D, PieceType, Color, Move, MoveKind, MOVE_KEY_MASK, PROMOTION_SQUARES
+)
+from chess3d_attacks import (
+    PAWN, KING, WHITE, BLACK, PAWN_ATTACKS, PAWN_PUSHES, iter_squares, piece_attacks, popcount
+)
+
+# Search scores are integers from white's point of view, within +-INF.
+# Being mated n plies from the root scores MATE - n for the winner. MATE is
+# far above any material balance (even a side with every pawn promoted to
+# a queen stays below 20000), so no evaluation is mistaken for a mate and
+# every mate outscores any material gain. INF still fits the signed 32-bit
+# score field of the transposition table.
+INF = 1000000
+MATE = 100000
+
+# Bound types of transposition table scores
+EXACT, LOWER, UPPER = 1, 2, 3
+
+# Scores this close to MATE are mates. The table stores them relative to
+# the position rather than the root, so they stay valid at any ply.
+MATE_THRESHOLD = MATE - 1000
+
+def score_to_table(score, ply):
+    if score > MATE_THRESHOLD:
+        return score + ply
+    if score < -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+def score_from_table(score, ply):
+    if score > MATE_THRESHOLD:
+        return score - ply
+    if score < -MATE_THRESHOLD:
+        return score + ply
+    return score
+
+class SearchAborted(Exception):
+    """Raised inside the search when the hard time limit has passed"""
+
+class TranspositionTable:
+    """Fixed-size table of search results keyed by Zobrist hash
+    
+    Each bucket holds a depth-preferred entry, replaced only by deeper or
+    equally deep results or entries from an earlier search, and an
+    always-replace entry that takes everything else. An entry is the
+    64-bit key plus one packed 64-bit word: move in bits 0-19, depth in
+    bits 20-25, bound in bits 26-27, search age in bits 28-31 and the
+    signed score from bit 32.
+    """
+    
+    ENTRY_BYTES = 16
+    
+    def __init__(self, size_mb=16):
+        """Allocate a table of at most size_mb megabytes"""
+        self.buckets = max(1, int(size_mb * 1024 * 1024) // (2 * self.ENTRY_BYTES))
+        self.age = 0
+        self.clear()
+    
+    def clear(self):
+        """Forget all stored results"""
+        self.keys = array('Q', bytes(16 * self.buckets))
+        self.data = array('q', bytes(16 * self.buckets))
+    
+    def new_search(self):
+        """Mark entries stored so far as old, so they are replaced first"""
+        self.age = (self.age + 1) & 15
+    
+    def probe(self, key):
+        """Return (depth, bound, score, move) stored for key, or None"""
+        slot = key % self.buckets * 2
+        keys = self.keys
+        if keys[slot] == key:
+            data = self.data[slot]
+        elif keys[slot + 1] == key:
+            data = self.data[slot + 1]
+        else:
+            return None
+        if not data >> 26 & 3:
+            return None
+        return data >> 20 & 63, data >> 26 & 3, data >> 32, data & MOVE_KEY_MASK
+    
+    def store(self, key, depth, score, alpha, beta, move):
+        """Store a score searched with the window (alpha, beta)"""
+        if score <= alpha:
+            bound = UPPER
+        elif score >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        data = (score << 32 | self.age << 28 | bound << 26 | min(depth, 63) << 20 |
+                move & MOVE_KEY_MASK)
+        
+        slot = key % self.buckets * 2
+        stored = self.data[slot]
+        if (self.keys[slot] != key and stored >> 20 & 63 > depth and
+                stored >> 28 & 15 == self.age):
+            slot += 1
+        self.keys[slot] = key
+        self.data[slot] = data
 
 class ChessAI:
     """Minimax-based AI engine with alpha-beta pruning for 3D chess"""
@@ -94,223 +193,431 @@ class ChessAI:
         [-50,-30,-30,-30,-30,-30,-30,-50]
     ]
     
-    def __init__(self, game, max_depth=3, time_limit=None):
-        """Initialize the AI engine with game state and parameters"""
+    # PIECE_VALUES by mailbox piece code (0 for an empty square) and by
+    # PieceType value, the latter for promotions in packed moves
+    CODE_VALUES = [0] + list(map(PIECE_VALUES.get, PieceType)) * 2
+    TYPE_VALUES = [0] + list(map(PIECE_VALUES.get, PieceType))
+    
+    # Nodes searched between two clock reads
+    CHECK_INTERVAL = 256
+    
+    # Plies with killer move slots
+    MAX_PLY = 64
+    
+    # Delta pruning: captures that cannot bring the score within this
+    # margin of alpha (beta for black) are not searched in quiescence
+    DELTA_MARGIN = 200
+    
+    def __init__(self, game, max_depth=3, time_limit=None, hash_mb=16, soft_time_limit=None,
+                 quiescence_depth=6):
+        """Initialize the AI engine with game state and parameters
+        
+        max_depth bounds the iterative deepening. time_limit is the hard
+        budget in seconds, after which a running iteration is abandoned;
+        no new iteration starts after soft_time_limit (half of time_limit
+        by default), as it would rarely finish in the time left.
+        quiescence_depth caps the capture sequences searched at the leaves.
+        """
         self.game = game
         self.max_depth = max_depth
         self.time_limit = time_limit
+        self.soft_time_limit = soft_time_limit
+        self.quiescence_depth = quiescence_depth
+        if soft_time_limit is None and time_limit:
+            self.soft_time_limit = time_limit / 2
         self.nodes_evaluated = 0
         self.start_time = 0
+        self.deadline = None
+        self.next_check = 0
+        self.completed_depth = 0
+        # Kept across get_best_move calls, so later moves reuse earlier work
+        self.table = TranspositionTable(hash_mb)
+        self.square_values = self.build_square_values()
+        # Move ordering: two quiet moves per ply that recently caused a
+        # cutoff, and cutoff scores by from and to square
+        self.killers = [[0, 0] for _ in range(self.MAX_PLY)]
+        self.history = [0] * (192 * 192)
     
     def get_best_move(self, color=None):
-        """Find the best move for the current position"""
+        """Find the best move by iterative deepening up to max_depth"""
         if color is None:
             color = self.game.current_player
             
         self.nodes_evaluated = 0
         self.start_time = time.time()
+        self.deadline = self.start_time + self.time_limit if self.time_limit else None
+        self.next_check = self.CHECK_INTERVAL
+        self.completed_depth = 0
+        self.table.new_search()
+        self.killers = [[0, 0] for _ in range(self.MAX_PLY)]
+        self.history = [score >> 1 for score in self.history]
         
-        # Create a copy of the game to avoid modifying the original
-        temp_game = deepcopy(self.game)
+        # Search on a copy so the original game is never modified; the
+        # search only unmakes its own moves, so history before the last
+        # capture or pawn move is not copied.
+        # An aborted iteration leaves moves made on the copy, so it is
+        # not used again afterwards.
+        temp_game = self.game.clone(history=False)
         
-        # Consider all valid moves for the current player
+        # Each iteration searches the previous best move first through the
+        # transposition table. Only completed iterations count, so an
+        # abort never returns a half-searched result.
         best_move = None
-        best_value = float('-inf') if color == Color.WHITE else float('inf')
-        alpha = float('-inf')
-        beta = float('inf')
+        best_value = 0
+        for depth in range(1, self.max_depth + 1):
+            try:
+                move, value = self.search_root(temp_game, color, depth)
+            except SearchAborted:
+                break
+            if move is None:
+                break
+            best_move, best_value = move, value
+            self.completed_depth = depth
+            
+            if self.soft_time_limit and time.time() - self.start_time > self.soft_time_limit:
+                break
+        
+        # Out of time before depth 1 finished: any legal move beats none
+        if best_move is None and self.completed_depth == 0:
+            moves = self.game.generate_moves(color)
+            if len(moves):
+                best_move = moves[0]
         
-        # Find all valid moves for the current player
-        all_moves = []
-        for level in range(3):
-            for rank in range(8):
-                for file in range(8):
-                    pos = Position(level, rank, file)
-                    piece = temp_game.get_piece(pos)
-                    if piece and piece.color == color:
-                        moves = temp_game.get_valid_moves(pos)
-                        all_moves.extend(moves)
+        end_time = time.time()
+        elapsed = max(end_time - self.start_time, 1e-9)
         
-        # Randomize move order for more varied play
-        random.shuffle(all_moves)
+        if best_move is not None:
+            best_move = Move.decode(best_move)
+        
+        print(f"AI evaluation: {self.nodes_evaluated} nodes in {elapsed:.2f}s ({self.nodes_evaluated/elapsed:.0f} nodes/s), "
+              f"depth {self.completed_depth}")
+        print(f"Best move: {best_move}, Eval: {best_value}")
+        
+        return best_move
+    
+    def search_root(self, game, color, depth):
+        """Search all moves of color to depth, returning (move, value)"""
+        best_move = None
+        best_value = -INF if color == Color.WHITE else INF
+        alpha = -INF
+        beta = INF
+        
+        # Order the moves like any other node; at the root equally ranked
+        # moves are shuffled for more varied play
+        entry = self.table.probe(game.hash_key)
+        hash_move = entry[3] if entry is not None else 0
+        all_moves = list(self.ordered_moves(game, color, hash_move, 0, shuffle=True))
         
         for move in all_moves:
             # Make move
-            captured_piece = temp_game.get_piece(move.to_pos)
-            piece = temp_game.get_piece(move.from_pos)
-            temp_game.make_move(move)
+            game.make_move_unchecked(move)
             
             # Evaluate position after move
             if color == Color.WHITE:
-                value = self.minimax(temp_game, self.max_depth - 1, alpha, beta, False)
+                value = self.minimax(game, depth - 1, alpha, beta, False, 1)
                 if value > best_value:
                     best_value = value
                     best_move = move
                 alpha = max(alpha, value)
             else:
-                value = self.minimax(temp_game, self.max_depth - 1, alpha, beta, True)
+                value = self.minimax(game, depth - 1, alpha, beta, True, 1)
                 if value < best_value:
                     best_value = value
                     best_move = move
                 beta = min(beta, value)
             
             # Undo move
-            temp_game.undo_move()
-            
-            # Check time limit
-            if self.time_limit and time.time() - self.start_time > self.time_limit:
-                break
-        
-        end_time = time.time()
-        elapsed = end_time - self.start_time
+            game.unmake_move()
         
-        print(f"AI evaluation: {self.nodes_evaluated} nodes in {elapsed:.2f}s ({self.nodes_evaluated/elapsed:.0f} nodes/s)")
-        print(f"Best move: {best_move}, Eval: {best_value}")
-        
-        return best_move
+        if best_move is not None:
+            self.table.store(game.hash_key, depth, best_value, -INF, INF, best_move)
+        return best_move, best_value
     
-    def minimax(self, game, depth, alpha, beta, maximizing):
-        """Minimax search with alpha-beta pruning"""
+    def check_time(self):
+        """Abort the search once the hard time limit has passed"""
+        self.next_check = self.nodes_evaluated + self.CHECK_INTERVAL
+        if self.deadline is not None and time.time() >= self.deadline:
+            raise SearchAborted()
+    
+    def minimax(self, game, depth, alpha, beta, maximizing, ply):
+        """Minimax search with alpha-beta pruning and a transposition table"""
+        # Base case: leaf node, resolved by searching captures only
+        if depth == 0:
+            return self.quiescence(game, alpha, beta, maximizing, ply, 0)
+        
         self.nodes_evaluated += 1
         
-        # Check if we've hit the time limit
-        if self.time_limit and time.time() - self.start_time > self.time_limit:
-            return 0
+        # Read the clock every CHECK_INTERVAL nodes only
+        if self.nodes_evaluated >= self.next_check:
+            self.check_time()
         
-        # Base case: leaf node or terminal position
-        if depth == 0:
-            return self.evaluate_position(game)
+        # A stored result at least as deep decides the node if its bound
+        # does; otherwise its move is searched first
+        hash_move = 0
+        entry = self.table.probe(game.hash_key)
+        if entry is not None:
+            entry_depth, bound, score, hash_move = entry
+            score = score_from_table(score, ply)
+            if entry_depth >= depth and (bound == EXACT or
+                                         bound == LOWER and score >= beta or
+                                         bound == UPPER and score <= alpha):
+                return score
         
+        alpha_start, beta_start = alpha, beta
+        best_move = 0
         if maximizing:
-            value = float('-inf')
-            for level in range(3):
-                for rank in range(8):
-                    for file in range(8):
-                        pos = Position(level, rank, file)
-                        piece = game.get_piece(pos)
-                        if piece and piece.color == Color.WHITE:
-                            moves = game.get_valid_moves(pos)
-                            for move in moves:
-                                game.make_move(move)
-                                value = max(value, self.minimax(game, depth - 1, alpha, beta, False))
-                                game.undo_move()
-                                
-                                alpha = max(alpha, value)
-                                if beta <= alpha:
-                                    return value
-            return value
+            value = -INF
+            for move in self.ordered_moves(game, Color.WHITE, hash_move, ply):
+                game.make_move_unchecked(move)
+                score = self.minimax(game, depth - 1, alpha, beta, False, ply + 1)
+                game.unmake_move()
+                
+                if score > value:
+                    value = score
+                    best_move = move
+                alpha = max(alpha, value)
+                if beta <= alpha:
+                    self.record_cutoff(game, move, depth, ply)
+                    break
         else:
-            value = float('inf')
-            for level in range(3):
-                for rank in range(8):
-                    for file in range(8):
-                        pos = Position(level, rank, file)
-                        piece = game.get_piece(pos)
-                        if piece and piece.color == Color.BLACK:
-                            moves = game.get_valid_moves(pos)
-                            for move in moves:
-                                game.make_move(move)
-                                value = min(value, self.minimax(game, depth - 1, alpha, beta, True))
-                                game.undo_move()
-                                
-                                beta = min(beta, value)
-                                if beta <= alpha:
-                                    return value
-            return value
+            value = INF
+            for move in self.ordered_moves(game, Color.BLACK, hash_move, ply):
+                game.make_move_unchecked(move)
+                score = self.minimax(game, depth - 1, alpha, beta, True, ply + 1)
+                game.unmake_move()
+                
+                if score < value:
+                    value = score
+                    best_move = move
+                beta = min(beta, value)
+                if beta <= alpha:
+                    self.record_cutoff(game, move, depth, ply)
+                    break
+        
+        # No legal moves: checkmate or stalemate
+        if not best_move:
+            value = self.terminal_score(game, Color.WHITE if maximizing else Color.BLACK, ply)
+        
+        # Not reached when the search is aborted, so only complete
+        # results are stored
+        self.table.store(game.hash_key, depth, score_to_table(value, ply),
+                         score_to_table(alpha_start, ply), score_to_table(beta_start, ply), best_move)
+        return value
     
-    def evaluate_position(self, game):
-        """Evaluate the current board position"""
-        if game.is_checkmate(Color.WHITE):
-            return -10000
-        elif game.is_checkmate(Color.BLACK):
-            return 10000
+    def terminal_score(self, game, color, ply):
+        """Score of a position where color has no legal moves
         
-        # Material evaluation
-        score = 0
+        Checkmate scores prefer the shortest mate for the winner and the
+        longest defence for the loser; stalemate is a draw.
+        """
+        if not game.is_check(color):
+            return 0
+        return -(MATE - ply) if color == Color.WHITE else MATE - ply
+    
+    def quiescence(self, game, alpha, beta, maximizing, ply, quiescence_ply):
+        """Search captures and promotions until the position is quiet
         
-        # Count endgame status (for king evaluation)
-        piece_count = 0
-        for level in range(3):
-            for rank in range(8):
-                for file in range(8):
-                    piece = game.get_piece(Position(level, rank, file))
-                    if piece and piece.type != PieceType.KING:
-                        piece_count += 1
+        The side to move may also stand pat on the static evaluation
+        instead of capturing, except in check, where every evasion is
+        searched and having none is mate.
+        """
+        self.nodes_evaluated += 1
+        if self.nodes_evaluated >= self.next_check:
+            self.check_time()
         
-        is_endgame = piece_count <= 10
+        color = Color.WHITE if maximizing else Color.BLACK
+        in_check = quiescence_ply < self.quiescence_depth and game.is_check(color)
+        if in_check:
+            value = -INF if maximizing else INF
+            moves = self.ordered_moves(game, color, 0, ply)
+        else:
+            value = self.evaluate_position(game)
+            if quiescence_ply >= self.quiescence_depth:
+                return value
+            moves = self.ordered_captures(game, color, ply)
+        # Delta pruning compares against the static evaluation, since value
+        # is raised to the best capture score as the loop goes on
+        stand_pat = value
         
-        # Evaluate all pieces
-        for level in range(3):
-            for rank in range(8):
-                for file in range(8):
-                    pos = Position(level, rank, file)
-                    piece = game.get_piece(pos)
-                    if not piece:
+        squares = game.squares
+        code_values = self.CODE_VALUES
+        type_values = self.TYPE_VALUES
+        if maximizing:
+            if value >= beta:
+                return value
+            alpha = max(alpha, value)
+            for move in moves:
+                # Skip captures that cannot raise alpha even with a margin
+                if not in_check:
+                    gain = code_values[squares[move >> 8 & 0xFF]]
+                    if move >> 16 & 0xF:
+                        gain += type_values[move >> 16 & 0xF] - type_values[1]
+                    if stand_pat + gain + self.DELTA_MARGIN <= alpha:
                         continue
-                    
-                    # Base material value
-                    value = self.PIECE_VALUES[piece.type]
-                    
-                    # Position evaluation for 2D chess (modified for 3D)
-                    if piece.color == Color.BLACK:
-                        rank_mirror = 7 - rank  # Mirror for black pieces
-                    else:
-                        rank_mirror = rank
-                    
-                    # Add positional value based on piece type
-                    if piece.type == PieceType.PAWN:
-                        value += self.PAWN_TABLE[rank_mirror][file]
-                    elif piece.type == PieceType.KNIGHT:
-                        value += self.KNIGHT_TABLE[rank_mirror][file]
-                    elif piece.type == PieceType.BISHOP:
-                        value += self.BISHOP_TABLE[rank_mirror][file]
-                    elif piece.type == PieceType.ROOK:
-                        value += self.ROOK_TABLE[rank_mirror][file]
-                    elif piece.type == PieceType.QUEEN:
-                        value += self.QUEEN_TABLE[rank_mirror][file]
-                    elif piece.type == PieceType.KING:
-                        if is_endgame:
-                            value += self.KING_END_TABLE[rank_mirror][file]
-                        else:
-                            value += self.KING_MIDDLE_TABLE[rank_mirror][file]
-                    
-                    # 3D chess specific evaluation
-                    if level == 1:  # Middle level is usually more valuable
-                        value += 10
-                    
-                    # Add to score (positive for white, negative for black)
-                    if piece.color == Color.WHITE:
-                        score += value
-                    else:
-                        score -= value
+                
+                game.make_move_unchecked(move)
+                score = self.quiescence(game, alpha, beta, False, ply + 1, quiescence_ply + 1)
+                game.unmake_move()
+                
+                if score > value:
+                    value = score
+                    alpha = max(alpha, value)
+                    if alpha >= beta:
+                        break
+        else:
+            if value <= alpha:
+                return value
+            beta = min(beta, value)
+            for move in moves:
+                if not in_check:
+                    gain = code_values[squares[move >> 8 & 0xFF]]
+                    if move >> 16 & 0xF:
+                        gain += type_values[move >> 16 & 0xF] - type_values[1]
+                    if stand_pat - gain - self.DELTA_MARGIN >= beta:
+                        continue
+                
+                game.make_move_unchecked(move)
+                score = self.quiescence(game, alpha, beta, True, ply + 1, quiescence_ply + 1)
+                game.unmake_move()
+                
+                if score < value:
+                    value = score
+                    beta = min(beta, value)
+                    if alpha >= beta:
+                        break
         
-        # Mobility evaluation (number of legal moves)
-        white_mobility = 0
-        black_mobility = 0
+        # In check without an evasion
+        if value == -INF or value == INF:
+            return self.terminal_score(game, color, ply)
+        return value
+    
+    def ordered_captures(self, game, color, ply, shuffle=False):
+        """Captures and promotions in sort_captures order"""
+        captures = list(game.generate_moves(color, MoveKind.CAPTURES, ply))
+        self.sort_captures(game, captures, shuffle)
+        return captures
+    
+    def sort_captures(self, game, captures, shuffle=False):
+        """Sort captures in place, most valuable victim first, then least
+        valuable attacker; a promotion counts as capturing its new piece"""
+        squares = game.squares
+        code_values = self.CODE_VALUES
+        type_values = self.TYPE_VALUES
+        if shuffle:
+            random.shuffle(captures)
+        captures.sort(key=lambda move: code_values[squares[move & 0xFF]] -
+                      (code_values[squares[move >> 8 & 0xFF]] + type_values[move >> 16 & 0xF]) * 65536)
+    
+    def sort_quiets(self, quiets, shuffle=False):
+        """Sort quiet moves in place by history score"""
+        history = self.history
+        if shuffle:
+            random.shuffle(quiets)
+        quiets.sort(key=lambda move: -history[(move & 0xFF) * 192 + (move >> 8 & 0xFF)])
+    
+    def ordered_moves(self, game, color, hash_move, ply, shuffle=False):
+        """Yield legal moves best first: hash move, captures, killers, quiets
         
-        for level in range(3):
-            for rank in range(8):
-                for file in range(8):
-                    pos = Position(level, rank, file)
-                    piece = game.get_piece(pos)
-                    if not piece:
-                        continue
-                    
-                    moves = game.get_valid_moves(pos)
-                    if piece.color == Color.WHITE:
-                        white_mobility += len(moves)
-                    else:
-                        black_mobility += len(moves)
+        The stages come from Chess3D.staged_moves, with captures in
+        sort_captures order and quiet moves by history score.
+        """
+        killers = self.killers[ply] if ply < self.MAX_PLY else ()
+        return game.staged_moves(
+            color, hash_move, ply, killers,
+            lambda captures: self.sort_captures(game, captures, shuffle),
+            lambda quiets: self.sort_quiets(quiets, shuffle))
+    
+    def record_cutoff(self, game, move, depth, ply):
+        """Remember a quiet move that caused a beta cutoff"""
+        if game.squares[move >> 8 & 0xFF] or move >> 16 & 0xF:
+            return
+        move &= MOVE_KEY_MASK
+        if ply < self.MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+        self.history[(move & 0xFF) * 192 + (move >> 8 & 0xFF)] += depth * depth
+    
+    def build_square_values(self):
+        """Material plus positional value of each piece kind on each square
         
-        # Add mobility score (scaled down)
-        score += (white_mobility - black_mobility) * 2
+        Indexed [color][piece type][square], with the endgame king table
+        as piece type 6.
+        """
+        tables = [self.PAWN_TABLE, self.KNIGHT_TABLE, self.BISHOP_TABLE,
+                  self.ROOK_TABLE, self.QUEEN_TABLE, self.KING_MIDDLE_TABLE, self.KING_END_TABLE]
+        piece_types = list(PieceType) + [PieceType.KING]
+        square_values = []
+        for color_index in (WHITE, BLACK):
+            color_values = []
+            for piece_type, table in zip(piece_types, tables):
+                values = []
+                for square in range(192):
+                    level, rank, file = square >> 6, square >> 3 & 7, square & 7
+                    # Position evaluation for 2D chess (modified for 3D);
+                    # ranks are mirrored for black pieces
+                    rank_mirror = 7 - rank if color_index == BLACK else rank
+                    value = self.PIECE_VALUES[piece_type] + table[rank_mirror][file]
+                    # Middle level is usually more valuable
+                    if level == 1:
+                        value += 10
+                    values.append(value)
+                color_values.append(values)
+            square_values.append(color_values)
+        return square_values
+    
+    def evaluate_position(self, game):
+        """Evaluate the current board position from white's point of view
         
-        # Check status
-        if game.is_check(Color.WHITE):
-            score -= 50
-        if game.is_check(Color.BLACK):
-            score += 50
+        A pure function of the board (material, piece-square values and
+        mobility); checkmate and stalemate are scored by the search.
+        """
+        kings = game.bitboards[WHITE][KING] | game.bitboards[BLACK][KING]
+        is_endgame = popcount((game.occupancy[WHITE] | game.occupancy[BLACK]) & ~kings) <= 10
         
+        score = 0
+        for color_index in (WHITE, BLACK):
+            color_values = self.square_values[color_index]
+            value = 0
+            for piece_type, bitboard in enumerate(game.bitboards[color_index]):
+                if piece_type == KING and is_endgame:
+                    values = color_values[KING + 1]
+                else:
+                    values = color_values[piece_type]
+                for square in iter_squares(bitboard):
+                    value += values[square]
+            score += value if color_index == WHITE else -value
+        
+        # Mobility evaluation (pseudo-legal target squares, scaled down)
+        score += (self.mobility(game, WHITE) - self.mobility(game, BLACK)) * 2
         return score
+    
+    def mobility(self, game, color_index):
+        """Count pseudo-legal moves using the shared attack tables
+        
+        Matches the number of moves get_valid_moves would return: pawns
+        include the double push from their start rank, and a promotion
+        counts once per promotion piece.
+        """
+        occupied = game.occupancy[WHITE] | game.occupancy[BLACK]
+        own = game.occupancy[color_index]
+        enemies = game.occupancy[1 - color_index]
+        start_rank = 1 if color_index == WHITE else 6
+        promotion_squares = PROMOTION_SQUARES[color_index]
+        count = 0
+        for piece_type, bitboard in enumerate(game.bitboards[color_index]):
+            for square in iter_squares(bitboard):
+                if piece_type == PAWN:
+                    pushes = PAWN_PUSHES[color_index][square] & ~occupied
+                    if pushes and (square >> 3) & 7 == start_rank:
+                        pushes |= PAWN_PUSHES[color_index][pushes.bit_length() - 1] & ~occupied
+                    targets = PAWN_ATTACKS[color_index][square] & enemies | pushes
+                    count += popcount(targets) + 3 * popcount(targets & promotion_squares)
+                else:
+                    targets = piece_attacks(piece_type, color_index, square, occupied) & ~own
+                    count += popcount(targets)
+        return count
 
 class AIPlayer:
     """AI player implementation for easy integration with the game"""
@@ -329,9 +636,9 @@ class AIPlayer:
         elif level == 3:
             self.ai = ChessAI(self.game, max_depth=3)
         elif level == 4:
-            self.ai = ChessAI(self.game, max_depth=3, time_limit=5)
+            self.ai = ChessAI(self.game, max_depth=5, time_limit=5)
         else:  # level 5
-            self.ai = ChessAI(self.game, max_depth=4, time_limit=10)
+            self.ai = ChessAI(self.game, max_depth=8, time_limit=10)
     
     def make_move(self, color=None):
         """Make the best move for the specified color"""
@@ -0,0 +1,244 @@
+from typing import List, Tuple
+
+import numpy as np
+
+# Bitboard layout: square index = level * 64 + rank * 8 + file, so each level
+# occupies one 64-bit word of a 192-bit Python integer.
+NUM_SQUARES = 192
+FULL_BOARD = (1 << NUM_SQUARES) - 1
+
+# Piece type and color indices, in PieceType / Color declaration order
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+WHITE, BLACK = 0, 1
+
+# (level, rank, file) steps used by the move generator
+ORTHOGONAL_STEPS = [(0, 0, 1), (0, 1, 0), (0, 0, -1), (0, -1, 0)]
+DIAGONAL_STEPS = [(0, 1, 1), (0, 1, -1), (0, -1, 1), (0, -1, -1)]
+KNIGHT_STEPS = [
+    (0, 2, 1), (0, 1, 2), (0, -1, 2), (0, -2, 1),
+    (0, -2, -1), (0, -1, -2), (0, 1, -2), (0, 2, -1)
+]
+LEVEL_DIAGONAL_STEPS = [(dl, dr, df) for dl in (1, -1) for dr in (1, -1) for df in (1, -1)]
+LEVEL_VERTICAL_STEPS = [(1, 0, 0), (-1, 0, 0)]
+PAWN_CAPTURE_STEPS = [
+    [(0, 1, -1), (0, 1, 1)],    # White
+    [(0, -1, -1), (0, -1, 1)]   # Black
+]
+PAWN_PUSH_STEPS = [(0, 1, 0), (0, -1, 0)]
+
+def square_index(level: int, rank: int, file: int) -> int:
+    return (level << 6) | (rank << 3) | file
+
+def iter_squares(bitboard: int):
+    while bitboard:
+        low_bit = bitboard & -bitboard
+        yield low_bit.bit_length() - 1
+        bitboard ^= low_bit
+
+def popcount(bitboard: int) -> int:
+    return bin(bitboard).count("1")
+
+def _build_shift_table():
+    # For every step, the mask of squares whose neighbour in that direction is
+    # still on the board, so a shift never wraps across files, ranks or levels.
+    steps = set(ORTHOGONAL_STEPS + DIAGONAL_STEPS + KNIGHT_STEPS +
+                LEVEL_DIAGONAL_STEPS + LEVEL_VERTICAL_STEPS)
+    table = {}
+    for step in steps:
+        mask = 0
+        for level in range(3):
+            for rank in range(8):
+                for file in range(8):
+                    if (0 <= level + step[0] < 3 and
+                        0 <= rank + step[1] < 8 and
+                        0 <= file + step[2] < 8):
+                        mask |= 1 << square_index(level, rank, file)
+        table[step] = (mask, step[0] * 64 + step[1] * 8 + step[2])
+    return table
+
+SHIFT_TABLE = _build_shift_table()
+
+def shift_bitboard(bitboard: int, step: Tuple[int, int, int]) -> int:
+    mask, offset = SHIFT_TABLE[step]
+    bitboard &= mask
+    return bitboard << offset if offset > 0 else bitboard >> -offset
+
+def _build_leaper_table(steps) -> List[int]:
+    table = []
+    for square in range(NUM_SQUARES):
+        targets = 0
+        for step in steps:
+            targets |= shift_bitboard(1 << square, step)
+        table.append(targets)
+    return table
+
+# Per-square target tables for the non-sliding moves, in-level and between levels
+KNIGHT_ATTACKS = _build_leaper_table(KNIGHT_STEPS + LEVEL_DIAGONAL_STEPS)
+KING_ATTACKS = _build_leaper_table(ORTHOGONAL_STEPS + DIAGONAL_STEPS)
+LEVEL_DIAGONAL_ATTACKS = _build_leaper_table(LEVEL_DIAGONAL_STEPS)
+LEVEL_VERTICAL_ATTACKS = _build_leaper_table(LEVEL_VERTICAL_STEPS)
+PAWN_ATTACKS = [_build_leaper_table(steps) for steps in PAWN_CAPTURE_STEPS]
+PAWN_PUSHES = [_build_leaper_table([step]) for step in PAWN_PUSH_STEPS]
+
+def _build_ray_table(step) -> List[int]:
+    # Every square reachable from each square along `step` on an empty board
+    table = []
+    for square in range(NUM_SQUARES):
+        ray = 0
+        bit = shift_bitboard(1 << square, step)
+        while bit:
+            ray |= bit
+            bit = shift_bitboard(bit, step)
+        table.append(ray)
+    return table
+
+# Sliding rays stay within a level; the level-change moves of the 3D rules
+# are single steps and live in the LEVEL_*_ATTACKS tables above.
+RAYS = [_build_ray_table(step) for step in ORTHOGONAL_STEPS + DIAGONAL_STEPS]
+# Rays towards higher square indices find their nearest blocker in the lowest
+# set bit, the others in the highest one.
+RAY_INCREASING = [SHIFT_TABLE[step][1] > 0 for step in ORTHOGONAL_STEPS + DIAGONAL_STEPS]
+
+def _build_between_table() -> List[List[int]]:
+    # Squares strictly between two squares on a shared in-level line, or 0
+    table = [[0] * NUM_SQUARES for _ in range(NUM_SQUARES)]
+    for square in range(NUM_SQUARES):
+        for step in ORTHOGONAL_STEPS + DIAGONAL_STEPS:
+            between = 0
+            bit = shift_bitboard(1 << square, step)
+            while bit:
+                table[square][bit.bit_length() - 1] = between
+                between |= bit
+                bit = shift_bitboard(bit, step)
+    return table
+
+ORTHOGONAL_RAYS = [RAYS[0][sq] | RAYS[1][sq] | RAYS[2][sq] | RAYS[3][sq] for sq in range(NUM_SQUARES)]
+DIAGONAL_RAYS = [RAYS[4][sq] | RAYS[5][sq] | RAYS[6][sq] | RAYS[7][sq] for sq in range(NUM_SQUARES)]
+BETWEEN = _build_between_table()
+
+def ray_attacks(square: int, direction: int, occupied: int) -> int:
+    ray = RAYS[direction][square]
+    blockers = ray & occupied
+    if blockers:
+        if RAY_INCREASING[direction]:
+            blocker = (blockers & -blockers).bit_length() - 1
+        else:
+            blocker = blockers.bit_length() - 1
+        ray ^= RAYS[direction][blocker]
+    return ray
+
+def rook_attacks(square: int, occupied: int) -> int:
+    return (ray_attacks(square, 0, occupied) | ray_attacks(square, 1, occupied) |
+            ray_attacks(square, 2, occupied) | ray_attacks(square, 3, occupied) |
+            LEVEL_VERTICAL_ATTACKS[square])
+
+def bishop_attacks(square: int, occupied: int) -> int:
+    return (ray_attacks(square, 4, occupied) | ray_attacks(square, 5, occupied) |
+            ray_attacks(square, 6, occupied) | ray_attacks(square, 7, occupied) |
+            LEVEL_DIAGONAL_ATTACKS[square])
+
+def queen_attacks(square: int, occupied: int) -> int:
+    # Queens change level diagonally only, like bishops
+    return (ray_attacks(square, 0, occupied) | ray_attacks(square, 1, occupied) |
+            ray_attacks(square, 2, occupied) | ray_attacks(square, 3, occupied) |
+            bishop_attacks(square, occupied))
+
+def piece_attacks(piece_type: int, color: int, square: int, occupied: int) -> int:
+    # Squares attacked by a piece on `square`, including the 3D moves between
+    # levels. Pawn pushes are not attacks.
+    if piece_type == PAWN:
+        return PAWN_ATTACKS[color][square]
+    if piece_type == KNIGHT:
+        return KNIGHT_ATTACKS[square]
+    if piece_type == BISHOP:
+        return bishop_attacks(square, occupied)
+    if piece_type == ROOK:
+        return rook_attacks(square, occupied)
+    if piece_type == QUEEN:
+        return queen_attacks(square, occupied)
+    return KING_ATTACKS[square]
+
+def attackers_to(square: int, pieces: List[int], color: int, occupied: int) -> int:
+    # Pieces of `color` (one bitboard per piece type) attacking `square`,
+    # found by looking outward from the square with each attack pattern.
+    # Every pattern is symmetric except the pawn's, which is mirrored.
+    diagonal_sliders = pieces[BISHOP] | pieces[QUEEN]
+    orthogonal_sliders = pieces[ROOK] | pieces[QUEEN]
+    attackers = (PAWN_ATTACKS[1 - color][square] & pieces[PAWN] |
+                 KNIGHT_ATTACKS[square] & pieces[KNIGHT] |
+                 KING_ATTACKS[square] & pieces[KING] |
+                 LEVEL_DIAGONAL_ATTACKS[square] & diagonal_sliders |
+                 LEVEL_VERTICAL_ATTACKS[square] & pieces[ROOK])
+    if diagonal_sliders:
+        for direction in range(4, 8):
+            attackers |= ray_attacks(square, direction, occupied) & diagonal_sliders
+    if orthogonal_sliders:
+        for direction in range(4):
+            attackers |= ray_attacks(square, direction, occupied) & orthogonal_sliders
+    return attackers
+
+# Whole-board attack counts with NumPy. Boards are (3, 8, 8) arrays of
+# mailbox piece codes, color * 6 + type + 1 with 0 for an empty square.
+# Shifts are precomputed gather tables: entry [i, square] is the square one
+# step `steps[i]` behind `square`, or the always-empty sentinel square 192
+# if that lies off the board.
+BOARD_SHAPE = (3, 8, 8)
+_SENTINEL = NUM_SQUARES
+
+def _gather_table(steps) -> np.ndarray:
+    table = np.full((len(steps), NUM_SQUARES + 1), _SENTINEL, dtype=np.intp)
+    for i, (dl, dr, df) in enumerate(steps):
+        for level in range(3):
+            for rank in range(8):
+                for file in range(8):
+                    if 0 <= level - dl < 3 and 0 <= rank - dr < 8 and 0 <= file - df < 8:
+                        table[i, square_index(level, rank, file)] = square_index(level - dl, rank - dr, file - df)
+    return table
+
+_PAWN_GATHER = [_gather_table(steps) for steps in PAWN_CAPTURE_STEPS]
+_KNIGHT_GATHER = _gather_table(KNIGHT_STEPS)
+_KING_GATHER = _gather_table(ORTHOGONAL_STEPS + DIAGONAL_STEPS)
+_LEVEL_DIAGONAL_GATHER = _gather_table(LEVEL_DIAGONAL_STEPS)
+_LEVEL_VERTICAL_GATHER = _gather_table(LEVEL_VERTICAL_STEPS)
+# One ray step in every direction at once, for fronts shaped (direction, color, square)
+_RAY_GATHER = _KING_GATHER[:, None, :]
+_RAY_DIRECTIONS = np.arange(8)[:, None, None]
+_RAY_COLORS = np.arange(2)[None, :, None]
+
+def attack_count_maps(board: np.ndarray) -> np.ndarray:
+    # Number of pieces of each color attacking each square, as a
+    # (2, 3, 8, 8) int16 array indexed [color, level, rank, file]. Occupied
+    # squares count their defenders too. Leapers sum their piece masks
+    # gathered over every step; sliders push one front per direction and
+    # color along the rays, cut off behind the first occupied square.
+    codes = np.asarray(board, dtype=np.intp).reshape(NUM_SQUARES)
+    pieces = np.zeros((13, NUM_SQUARES + 1), dtype=np.int16)
+    pieces[codes, np.arange(NUM_SQUARES)] = 1
+    pieces = pieces[1:].reshape(2, 6, NUM_SQUARES + 1)
+    empty = pieces.sum(axis=(0, 1)) == 0
+    empty[_SENTINEL] = False
+    
+    counts = np.zeros((2, NUM_SQUARES + 1), dtype=np.int16)
+    for color in (WHITE, BLACK):
+        counts[color] += pieces[color, PAWN][_PAWN_GATHER[color]].sum(axis=0)
+    
+    # Knights, bishops and queens also step diagonally between levels,
+    # rooks straight up and down
+    diagonal_sliders = pieces[:, BISHOP] + pieces[:, QUEEN]
+    orthogonal_sliders = pieces[:, ROOK] + pieces[:, QUEEN]
+    counts += pieces[:, KNIGHT][:, _KNIGHT_GATHER].sum(axis=1)
+    counts += pieces[:, KING][:, _KING_GATHER].sum(axis=1)
+    counts += (pieces[:, KNIGHT] + diagonal_sliders)[:, _LEVEL_DIAGONAL_GATHER].sum(axis=1)
+    counts += pieces[:, ROOK][:, _LEVEL_VERTICAL_GATHER].sum(axis=1)
+    
+    # Directions 0-3 are orthogonal and 4-7 diagonal, as in RAYS
+    front = np.stack([orthogonal_sliders] * 4 + [diagonal_sliders] * 4)
+    rays = np.zeros_like(front)
+    while True:
+        front = front[_RAY_DIRECTIONS, _RAY_COLORS, _RAY_GATHER]
+        if not front.any():
+            break
+        rays += front
+        front *= empty
+    counts += rays.sum(axis=0)
+    return counts[:, :NUM_SQUARES].reshape((2,) + BOARD_SHAPE)
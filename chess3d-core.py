@@ -1,7 +1,15 @@
 import numpy as np
+import random
+import re
+from array import array
 from enum import Enum, auto
 from dataclasses import dataclass
 from typing import List, Tuple, Optional, Dict, Set
+from chess3d_attacks import (
+    PAWN, BISHOP, ROOK, QUEEN, KING, BETWEEN, DIAGONAL_RAYS, FULL_BOARD, ORTHOGONAL_RAYS,
+    PAWN_ATTACKS, PAWN_PUSHES, attack_count_maps, attackers_to, iter_squares, piece_attacks,
+    square_index
+)
 
 class PieceType(Enum):
     PAWN = auto()
@@ -15,21 +23,38 @@ class Color(Enum):
     WHITE = auto()
     BLACK = auto()
 
-@dataclass
+class MoveKind(Enum):
+    ALL = auto()
+    CAPTURES = auto()  # Captures and promotions
+    QUIETS = auto()    # Everything else
+
+@dataclass(frozen=True)
 class Piece:
+    __slots__ = ('type', 'color')
     type: PieceType
     color: Color
     
     def __repr__(self):
         return f"{self.color.name[0]}{self.type.name[0]}"
+    
+    def __reduce__(self):
+        # Frozen slotted instances cannot be restored attribute by attribute
+        return (Piece, (self.type, self.color))
 
-@dataclass
+@dataclass(frozen=True)
 class Position:
+    __slots__ = ('level', 'rank', 'file', 'index')
     level: int  # Z coordinate (0-2)
     rank: int   # Y coordinate (0-7)
     file: int   # X coordinate (0-7)
     
+    def __post_init__(self):
+        # Square index (0-191), kept in a slot so hashing needs no tuple
+        object.__setattr__(self, 'index', square_index(self.level, self.rank, self.file))
+    
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, Position):
             return False
         return (self.level == other.level and 
@@ -37,36 +62,232 @@ class Position:
                 self.file == other.file)
     
     def __hash__(self):
-        return hash((self.level, self.rank, self.file))
+        return self.index
+    
+    def __reduce__(self):
+        return (Position, (self.level, self.rank, self.file))
     
     def __repr__(self):
         level_char = chr(ord('A') + self.level)
         file_char = chr(ord('a') + self.file)
         rank_char = str(self.rank + 1)
         return f"{level_char}{file_char}{rank_char}"
+    
+    @classmethod
+    def from_string(cls, text: str) -> 'Position':
+        # Inverse of __repr__, e.g. "Be4"
+        if len(text) != 3 or text[0] not in "ABC" or text[1] not in "abcdefgh" or text[2] not in "12345678":
+            raise ValueError(f"invalid position: {text!r}")
+        return POSITIONS[square_index(ord(text[0]) - ord('A'), int(text[2]) - 1, ord(text[1]) - ord('a'))]
 
-@dataclass
+@dataclass(init=False)
 class Move:
+    __slots__ = ('from_pos', 'to_pos', 'promotion')
     from_pos: Position
     to_pos: Position
-    promotion: Optional[PieceType] = None
+    promotion: Optional[PieceType]
+    
+    def __init__(self, from_pos: Position, to_pos: Position, promotion: Optional[PieceType] = None):
+        self.from_pos = from_pos
+        self.to_pos = to_pos
+        self.promotion = promotion
+    
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, Move):
+            return NotImplemented
+        return (self.from_pos == other.from_pos and
+                self.to_pos == other.to_pos and
+                self.promotion == other.promotion)
+    
+    def __hash__(self):
+        return hash((self.from_pos, self.to_pos, self.promotion))
     
     def __repr__(self):
         result = f"{self.from_pos}->{self.to_pos}"
         if self.promotion:
             result += f"={self.promotion.name[0]}"
         return result
+    
+    @classmethod
+    def from_string(cls, text: str) -> 'Move':
+        # Inverse of __repr__, e.g. "Ae7->Ae8=Q"
+        squares, _, promotion = text.strip().partition("=")
+        from_text, arrow, to_text = squares.partition("->")
+        if not arrow:
+            raise ValueError(f"invalid move: {text!r}")
+        promotion_type = None
+        if promotion:
+            promotion_type = PROMOTION_LETTERS.get(promotion)
+            if promotion_type is None:
+                raise ValueError(f"invalid promotion: {text!r}")
+        return cls(Position.from_string(from_text), Position.from_string(to_text), promotion_type)
+    
+    def encode(self) -> int:
+        # Packed form without flags; flags are only set by the move generator
+        from_pos, to_pos = self.from_pos, self.to_pos
+        move = from_pos.index | to_pos.index << 8
+        if self.promotion:
+            move |= self.promotion.value << 16
+        return move
+    
+    @classmethod
+    def decode(cls, move: int) -> 'Move':
+        promotion = move >> 16 & 0xF
+        return cls(square_position(move & 0xFF), square_position(move >> 8 & 0xFF),
+                   PieceType(promotion) if promotion else None)
+
+@dataclass(frozen=True)
+class GameStatus:
+    # Outcome flags for the side to move, as returned by Chess3D.status()
+    __slots__ = ('check', 'checkmate', 'stalemate', 'draw', 'draw_reason', 'winner')
+    check: bool
+    checkmate: bool
+    stalemate: bool
+    draw: bool                  # Stalemate or a drawing rule
+    draw_reason: Optional[str]  # "stalemate", "fifty-move rule", "repetition" or "insufficient material"
+    winner: Optional[Color]
+    
+    @property
+    def game_over(self) -> bool:
+        return self.checkmate or self.draw
+
+# Packed move layout (fits array('I')): bits 0-7 from square, bits 8-15 to
+# square, bits 16-19 promotion PieceType value (0 for none), bits 20+ flags.
+MOVE_CAPTURE = 1 << 20
+MOVE_KEY_MASK = (1 << 20) - 1  # From, to and promotion without flags
+MAX_MOVES = 1024
+PROMOTION_TYPES = [PieceType.QUEEN, PieceType.ROOK, PieceType.BISHOP, PieceType.KNIGHT]
+PROMOTION_VALUES = [promotion_type.value for promotion_type in PROMOTION_TYPES]
+PROMOTION_LETTERS = {promotion_type.name[0]: promotion_type for promotion_type in PROMOTION_TYPES}
+
+def move_from(move: int) -> int:
+    return move & 0xFF
+
+def move_to(move: int) -> int:
+    return move >> 8 & 0xFF
+
+def move_promotion(move: int) -> Optional[PieceType]:
+    promotion = move >> 16 & 0xF
+    return PieceType(promotion) if promotion else None
+
+def new_move_buffer() -> array:
+    # Preallocated storage for fill_moves; MAX_MOVES bounds one side's moves
+    return array('I', bytes(4 * MAX_MOVES))
+
+PIECE_TYPES = list(PieceType)
+TYPE_INDEX = {piece_type: i for i, piece_type in enumerate(PIECE_TYPES)}
+COLOR_INDEX = {Color.WHITE: 0, Color.BLACK: 1}
+
+# Zobrist keys: one per piece kind (color * 6 + type) and square, plus one
+# for black to move. Seeded so keys agree across processes and runs.
+_zobrist_random = random.Random(0x3D3D)
+ZOBRIST_PIECES = [[_zobrist_random.getrandbits(64) for _ in range(192)] for _ in range(12)]
+ZOBRIST_BLACK_TO_MOVE = _zobrist_random.getrandbits(64)
+# Mixed into the hash key to key perft subtree counts by remaining depth
+ZOBRIST_DEPTH = [_zobrist_random.getrandbits(64) for _ in range(64)]
+
+# Shared instances for the 192 squares and 12 piece kinds (color * 6 + type).
+# Both types are immutable, so the board and move generator hand these out
+# instead of allocating new objects.
+POSITIONS = [Position(square >> 6, (square >> 3) & 7, square & 7) for square in range(192)]
+PIECES = [Piece(piece_type, color) for color in COLOR_INDEX for piece_type in PIECE_TYPES]
+
+# Squares on which a pawn of each color promotes
+PROMOTION_SQUARES = [
+    sum(1 << square_index(level, 7, file) for level in range(3) for file in range(8)),
+    sum(1 << square_index(level, 0, file) for level in range(3) for file in range(8))
+]
+
+# Mailbox piece codes: 0 for an empty square, otherwise color * 6 + type + 1
+EMPTY = 0
+PIECE_BY_CODE = [None] + PIECES
+
+# 3D FEN: the three levels A, B, C separated by "|", each written like a
+# FEN board from rank 8 down to rank 1, then side to move, halfmove clock
+# and fullmove number, e.g. the start position, with white on level A and
+# black on level C, is
+# "8/8/8/8/8/8/PPPPPPPP/RNBQKBNR|8/8/8/8/8/8/8/8|rnbqkbnr/pppppppp/8/8/8/8/8/8 w 0 1".
+FEN_LETTERS = ".PNBRQKpnbrqk"
+FEN_CODES = {letter: code for code, letter in enumerate(FEN_LETTERS) if code}
+_FEN_TRANSLATION = bytes.maketrans(bytes(range(13)), FEN_LETTERS.replace(".", "1").encode())
+_FEN_EMPTY_RUN = re.compile("1+")
+
+def square_position(square: int) -> Position:
+    return POSITIONS[square]
+
+def piece_of(piece_type: PieceType, color: Color) -> Piece:
+    return PIECES[COLOR_INDEX[color] * 6 + TYPE_INDEX[piece_type]]
+
+def piece_code(piece: Optional[Piece]) -> int:
+    if not piece:
+        return EMPTY
+    return COLOR_INDEX[piece.color] * 6 + TYPE_INDEX[piece.type] + 1
 
 class Chess3D:
     def __init__(self):
+        # Per-ply packed move buffers handed out by generate_moves
+        self._move_buffers = []
         self.reset()
     
     def reset(self):
-        # Initialize 3D board: 3 levels, 8 ranks, 8 files
-        self.board = np.full((3, 8, 8), None, dtype=object)
+        self.clear()
+        self.setup_pieces()
+    
+    def clear(self):
+        # Initialize 3D board: 3 levels, 8 ranks, 8 files, stored as one
+        # piece code per square in square index order
+        self.squares = bytearray(192)
+        # One bitboard per piece type and color plus per-color occupancy
+        self.bitboards = [[0] * len(PIECE_TYPES) for _ in COLOR_INDEX]
+        self.occupancy = [0, 0]
+        self.king_squares = [None, None]
+        self.hash_key = 0
         self.current_player = Color.WHITE
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
         self.move_history = []
-        self.setup_pieces()
+        # status() result and the (hash key, history length) it was computed for
+        self._status = None
+        self._status_key = None
+        # attack_maps() result and the hash key it was computed for
+        self._attack_maps = None
+        self._attack_maps_key = None
+    
+    @classmethod
+    def _empty(cls) -> 'Chess3D':
+        # An empty board without the cost of setting up and clearing pieces
+        game = cls.__new__(cls)
+        game._move_buffers = []
+        game.clear()
+        return game
+    
+    def clone(self, history: bool = True) -> 'Chess3D':
+        # Independent copy of the game state, much cheaper than deepcopy.
+        # Without full history the copy keeps only the undo records since
+        # the last capture or pawn move, which repetition detection needs,
+        # and cannot unmake moves played before those.
+        game = Chess3D.__new__(type(self))
+        game._move_buffers = []
+        game.squares = self.squares[:]
+        game.bitboards = [self.bitboards[0][:], self.bitboards[1][:]]
+        game.occupancy = self.occupancy[:]
+        game.king_squares = self.king_squares[:]
+        game.hash_key = self.hash_key
+        game.current_player = self.current_player
+        game.halfmove_clock = self.halfmove_clock
+        game.fullmove_number = self.fullmove_number
+        # Undo records are immutable tuples and can be shared
+        if history:
+            game.move_history = self.move_history[:]
+        else:
+            game.move_history = self.move_history[max(len(self.move_history) - self.halfmove_clock, 0):]
+        game._status = None
+        game._status_key = None
+        game._attack_maps = None
+        game._attack_maps_key = None
+        return game
     
     def setup_pieces(self):
         # Level 0 (bottom) - White pieces
@@ -87,16 +308,57 @@ class Chess3D:
         
         for file in range(8):
             # Set back rank
-            self.board[level, back_rank, file] = Piece(piece_order[file], color)
+            self.set_piece(Position(level, back_rank, file), piece_of(piece_order[file], color))
             
             # Set pawns
-            self.board[level, pawn_rank, file] = Piece(PieceType.PAWN, color)
+            self.set_piece(Position(level, pawn_rank, file), piece_of(PieceType.PAWN, color))
+    
+    @property
+    def board(self) -> np.ndarray:
+        # Read-only 3x8x8 int8 view of the piece codes, for bulk consumers
+        view = np.frombuffer(self.squares, dtype=np.int8).reshape(3, 8, 8)
+        view.flags.writeable = False
+        return view
     
     def get_piece(self, pos: Position) -> Optional[Piece]:
-        return self.board[pos.level, pos.rank, pos.file]
+        return PIECE_BY_CODE[self.squares[pos.index]]
     
     def set_piece(self, pos: Position, piece: Optional[Piece]):
-        self.board[pos.level, pos.rank, pos.file] = piece
+        self._set_square(pos.index, piece_code(piece))
+    
+    def _set_square(self, square: int, code: int):
+        # Every board change goes through here so the bitboards, king
+        # squares and hash key stay in step with the mailbox
+        bit = 1 << square
+        old_code = self.squares[square]
+        if old_code:
+            color_index, type_index = divmod(old_code - 1, 6)
+            self.bitboards[color_index][type_index] &= ~bit
+            self.occupancy[color_index] &= ~bit
+            self.hash_key ^= ZOBRIST_PIECES[old_code - 1][square]
+            if type_index == KING and self.king_squares[color_index] == square:
+                self.king_squares[color_index] = None
+        if code:
+            color_index, type_index = divmod(code - 1, 6)
+            self.bitboards[color_index][type_index] |= bit
+            self.occupancy[color_index] |= bit
+            self.hash_key ^= ZOBRIST_PIECES[code - 1][square]
+            if type_index == KING:
+                self.king_squares[color_index] = square
+        self.squares[square] = code
+    
+    def pieces(self, color: Color):
+        # (Position, Piece) pairs for one side; the occupancy bitboards kept
+        # by set_piece are the piece lists, so no empty square is visited.
+        for square in iter_squares(self.occupancy[COLOR_INDEX[color]]):
+            yield POSITIONS[square], PIECE_BY_CODE[self.squares[square]]
+    
+    def king_position(self, color: Color) -> Optional[Position]:
+        square = self.king_squares[COLOR_INDEX[color]]
+        return None if square is None else square_position(square)
+    
+    def pieces_bitboard(self, color: Color, piece_type: PieceType) -> int:
+        return self.bitboards[COLOR_INDEX[color]][TYPE_INDEX[piece_type]]
     
     def is_valid_position(self, pos: Position) -> bool:
         return (0 <= pos.level < 3 and 
@@ -104,309 +366,665 @@ class Chess3D:
                 0 <= pos.file < 8)
     
     def make_move(self, move: Move) -> bool:
-        piece = self.get_piece(move.from_pos)
-        
-        if not piece or piece.color != self.current_player:
+        # Validating entry point for UI and other untrusted input
+        if not (self.is_valid_position(move.from_pos) and self.is_valid_position(move.to_pos)):
             return False
         
-        valid_moves = self.get_valid_moves(move.from_pos)
-        if move not in valid_moves:
+        packed = move.encode()
+        if not self.is_legal_move(packed, self.current_player):
             return False
         
-        # Execute move
-        captured_piece = self.get_piece(move.to_pos)
-        self.set_piece(move.to_pos, piece)
-        self.set_piece(move.from_pos, None)
+        self.make_move_unchecked(packed)
+        return True
+    
+    def make_move_unchecked(self, move: int):
+        # Plays a packed move known to be legal, e.g. one just generated by
+        # this game. The undo record is (move, captured code, moved code,
+        # hash key and halfmove clock before the move).
+        from_square, to_square = move & 0xFF, move >> 8 & 0xFF
+        moved = self.squares[from_square]
+        captured = self.squares[to_square]
+        self.move_history.append((move, captured, moved, self.hash_key, self.halfmove_clock))
         
-        # Handle promotion
-        if (move.promotion and 
-            piece.type == PieceType.PAWN and 
-            ((piece.color == Color.WHITE and move.to_pos.rank == 7) or
-             (piece.color == Color.BLACK and move.to_pos.rank == 0))):
-            self.set_piece(move.to_pos, Piece(move.promotion, piece.color))
+        # The halfmove clock counts moves since the last capture or pawn move
+        if captured or moved == 1 or moved == 7:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
         
-        # Record move
-        self.move_history.append((move, captured_piece))
+        # Execute move, replacing a promoting pawn by the new piece
+        promotion = move >> 16 & 0xF
+        if promotion:
+            self._set_square(to_square, (moved - 1) // 6 * 6 + promotion)
+        else:
+            self._set_square(to_square, moved)
+        self._set_square(from_square, EMPTY)
         
         # Switch player
-        self.current_player = Color.BLACK if self.current_player == Color.WHITE else Color.WHITE
-        
-        return True
+        if self.current_player == Color.WHITE:
+            self.current_player = Color.BLACK
+        else:
+            self.current_player = Color.WHITE
+            self.fullmove_number += 1
+        self.hash_key ^= ZOBRIST_BLACK_TO_MOVE
     
-    def undo_move(self) -> bool:
+    def unmake_move(self) -> bool:
         if not self.move_history:
             return False
         
-        move, captured_piece = self.move_history.pop()
-        piece = self.get_piece(move.to_pos)
+        move, captured, moved, hash_key, halfmove_clock = self.move_history.pop()
         
-        # Restore board state
-        self.set_piece(move.from_pos, piece)
-        self.set_piece(move.to_pos, captured_piece)
+        # Restore board state; `moved` is the pawn if the move promoted
+        self._set_square(move & 0xFF, moved)
+        self._set_square(move >> 8 & 0xFF, captured)
         
         # Switch back to previous player
-        self.current_player = Color.BLACK if self.current_player == Color.WHITE else Color.WHITE
+        if self.current_player == Color.WHITE:
+            self.current_player = Color.BLACK
+            self.fullmove_number -= 1
+        else:
+            self.current_player = Color.WHITE
+        self.hash_key = hash_key
+        self.halfmove_clock = halfmove_clock
         
         return True
     
+    def undo_move(self) -> bool:
+        return self.unmake_move()
+    
     def get_valid_moves(self, pos: Position) -> List[Move]:
+        # Pseudo-legal moves: these may leave the own king in check
         piece = self.get_piece(pos)
         if not piece:
             return []
         
-        moves = []
-        
-        if piece.type == PieceType.PAWN:
-            moves.extend(self._get_pawn_moves(pos, piece))
-        elif piece.type == PieceType.KNIGHT:
-            moves.extend(self._get_knight_moves(pos, piece))
-        elif piece.type == PieceType.BISHOP:
-            moves.extend(self._get_bishop_moves(pos, piece))
-        elif piece.type == PieceType.ROOK:
-            moves.extend(self._get_rook_moves(pos, piece))
-        elif piece.type == PieceType.QUEEN:
-            moves.extend(self._get_queen_moves(pos, piece))
-        elif piece.type == PieceType.KING:
-            moves.extend(self._get_king_moves(pos, piece))
-        
-        # Add special 3D moves between levels
-        moves.extend(self._get_3d_moves(pos, piece))
+        square = pos.index
+        color_index = COLOR_INDEX[piece.color]
+        targets = self._move_targets(square, TYPE_INDEX[piece.type], color_index)
+        return self._moves_to_targets(pos, piece, targets)
+    
+    def get_legal_moves(self, pos: Position) -> List[Move]:
+        piece = self.get_piece(pos)
+        if not piece:
+            return []
         
-        return moves
+        square = pos.index
+        color_index = COLOR_INDEX[piece.color]
+        check_mask, pins = self._legal_masks(color_index)
+        targets = self._legal_targets(square, TYPE_INDEX[piece.type], color_index, check_mask, pins)
+        return self._moves_to_targets(pos, piece, targets)
     
-    def _get_pawn_moves(self, pos: Position, piece: Piece) -> List[Move]:
-        moves = []
-        direction = 1 if piece.color == Color.WHITE else -1
-        start_rank = 1 if piece.color == Color.WHITE else 6
-        
-        # Forward move
-        new_pos = Position(pos.level, pos.rank + direction, pos.file)
-        if self.is_valid_position(new_pos) and not self.get_piece(new_pos):
-            # Check for promotion
-            if (new_pos.rank == 7 and piece.color == Color.WHITE) or (new_pos.rank == 0 and piece.color == Color.BLACK):
-                for promotion_type in [PieceType.QUEEN, PieceType.ROOK, PieceType.BISHOP, PieceType.KNIGHT]:
-                    moves.append(Move(pos, new_pos, promotion_type))
-            else:
-                moves.append(Move(pos, new_pos))
-            
-            # Double move from starting position
-            if pos.rank == start_rank:
-                new_pos = Position(pos.level, pos.rank + 2 * direction, pos.file)
-                if self.is_valid_position(new_pos) and not self.get_piece(new_pos):
-                    moves.append(Move(pos, new_pos))
+    def legal_moves(self, color: Color, kind: MoveKind = MoveKind.ALL) -> List[Move]:
+        buffer = new_move_buffer()
+        count = self.fill_moves(buffer, color, kind)
+        return [Move.decode(buffer[i]) for i in range(count)]
+    
+    def generate_moves(self, color: Color, kind: MoveKind = MoveKind.ALL, ply: int = 0) -> memoryview:
+        # Packed legal moves of one side in a buffer owned by the game. Each
+        # search ply gets its own buffer, so a caller may recurse while
+        # iterating; the view is overwritten by the next call for that ply.
+        while len(self._move_buffers) <= ply:
+            self._move_buffers.append(new_move_buffer())
+        buffer = self._move_buffers[ply]
+        count = self.fill_moves(buffer, color, kind)
+        return memoryview(buffer)[:count]
+    
+    def fill_moves(self, buffer: array, color: Color, kind: MoveKind = MoveKind.ALL) -> int:
+        # Writes the packed legal moves of `color` into a preallocated buffer
+        # (see new_move_buffer) and returns how many were written. Checkers
+        # and pins are computed once for the whole side.
+        color_index = COLOR_INDEX[color]
+        check_mask, pins = self._legal_masks(color_index)
+        enemies = self.occupancy[1 - color_index]
+        promotion_rank = 7 if color == Color.WHITE else 0
+        count = 0
         
-        # Capture moves
-        for file_offset in [-1, 1]:
-            new_pos = Position(pos.level, pos.rank + direction, pos.file + file_offset)
-            if self.is_valid_position(new_pos):
-                target = self.get_piece(new_pos)
-                if target and target.color != piece.color:
-                    if (new_pos.rank == 7 and piece.color == Color.WHITE) or (new_pos.rank == 0 and piece.color == Color.BLACK):
-                        for promotion_type in [PieceType.QUEEN, PieceType.ROOK, PieceType.BISHOP, PieceType.KNIGHT]:
-                            moves.append(Move(pos, new_pos, promotion_type))
+        # Restrict targets to the requested kind; promotions count as captures
+        if kind == MoveKind.ALL:
+            piece_mask = pawn_mask = FULL_BOARD
+        elif kind == MoveKind.CAPTURES:
+            piece_mask = enemies
+            pawn_mask = enemies | PROMOTION_SQUARES[color_index]
+        else:
+            piece_mask = FULL_BOARD & ~enemies
+            pawn_mask = piece_mask & ~PROMOTION_SQUARES[color_index]
+        
+        for type_index, bitboard in enumerate(self.bitboards[color_index]):
+            for square in iter_squares(bitboard):
+                targets = self._legal_targets(square, type_index, color_index, check_mask, pins)
+                targets &= pawn_mask if type_index == PAWN else piece_mask
+                for target in iter_squares(targets):
+                    move = square | target << 8
+                    if enemies >> target & 1:
+                        move |= MOVE_CAPTURE
+                    if type_index == PAWN and target >> 3 & 7 == promotion_rank:
+                        for promotion_type in PROMOTION_TYPES:
+                            buffer[count] = move | promotion_type.value << 16
+                            count += 1
                     else:
-                        moves.append(Move(pos, new_pos))
+                        buffer[count] = move
+                        count += 1
         
-        return moves
+        return count
     
-    def _get_knight_moves(self, pos: Position, piece: Piece) -> List[Move]:
-        moves = []
-        offsets = [
-            (2, 1), (1, 2), (-1, 2), (-2, 1),
-            (-2, -1), (-1, -2), (1, -2), (2, -1)
-        ]
+    def is_legal_move(self, move: int, color: Color) -> bool:
+        # Validates a packed move against the legal target squares of its
+        # piece rather than a generated move list; flags are ignored
+        from_square, to_square = move & 0xFF, move >> 8 & 0xFF
+        if from_square >= 192 or to_square >= 192:
+            return False
         
-        for rank_offset, file_offset in offsets:
-            new_pos = Position(pos.level, pos.rank + rank_offset, pos.file + file_offset)
-            if self.is_valid_position(new_pos):
-                target = self.get_piece(new_pos)
-                if not target or target.color != piece.color:
-                    moves.append(Move(pos, new_pos))
+        code = self.squares[from_square]
+        color_index = COLOR_INDEX[color]
+        if not code or (code - 1) // 6 != color_index:
+            return False
         
-        return moves
+        type_index = (code - 1) % 6
+        check_mask, pins = self._legal_masks(color_index)
+        if not self._legal_targets(from_square, type_index, color_index, check_mask, pins) >> to_square & 1:
+            return False
+        
+        # A pawn reaching the last rank must name a promotion, any other move must not
+        promotion = move >> 16 & 0xF
+        if type_index == PAWN and PROMOTION_SQUARES[color_index] >> to_square & 1:
+            return promotion in PROMOTION_VALUES
+        return promotion == 0
     
-    def _get_sliding_moves(self, pos: Position, piece: Piece, directions) -> List[Move]:
-        moves = []
+    def staged_moves(self, color: Color, hash_move: int = 0, ply: int = 0, killers=(),
+                     order_captures=None, order_quiets=None):
+        # Yields packed legal moves lazily in stages: the hash move first,
+        # then captures and promotions, then killers, then quiet moves. A
+        # stage is only generated once the previous one is used up, so a
+        # search that cuts off early skips the rest. Uses the generate_moves
+        # buffer for `ply`.
+        # Killers are quiet moves found in sibling positions, read when their
+        # stage starts and checked for legality. order_captures and
+        # order_quiets, if given, sort a stage's list of moves in place.
+        hash_move &= MOVE_KEY_MASK
+        if hash_move and self.is_legal_move(hash_move, color):
+            if self.occupancy[1 - COLOR_INDEX[color]] >> (hash_move >> 8 & 0xFF) & 1:
+                yield hash_move | MOVE_CAPTURE
+            else:
+                yield hash_move
+        else:
+            hash_move = 0
         
-        for direction in directions:
-            for distance in range(1, 8):
-                new_pos = Position(
-                    pos.level,
-                    pos.rank + direction[0] * distance,
-                    pos.file + direction[1] * distance
-                )
-                
-                if not self.is_valid_position(new_pos):
-                    break
-                
-                target = self.get_piece(new_pos)
-                if not target:
-                    moves.append(Move(pos, new_pos))
-                elif target.color != piece.color:
-                    moves.append(Move(pos, new_pos))
-                    break
-                else:
-                    break
+        captures = self.generate_moves(color, MoveKind.CAPTURES, ply)
+        if order_captures:
+            captures = list(captures)
+            order_captures(captures)
+        for move in captures:
+            if move & MOVE_KEY_MASK != hash_move:
+                yield move
         
-        return moves
+        searched = [hash_move]
+        squares = self.squares
+        for killer in tuple(killers):
+            killer &= MOVE_KEY_MASK
+            if (killer and killer not in searched and not squares[killer >> 8 & 0xFF] and
+                    not killer >> 16 & 0xF and self.is_legal_move(killer, color)):
+                searched.append(killer)
+                yield killer
+        
+        quiets = self.generate_moves(color, MoveKind.QUIETS, ply)
+        if order_quiets:
+            quiets = list(quiets)
+            order_quiets(quiets)
+        for move in quiets:
+            if move & MOVE_KEY_MASK not in searched:
+                yield move
     
-    def _get_bishop_moves(self, pos: Position, piece: Piece) -> List[Move]:
-        directions = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
-        return self._get_sliding_moves(pos, piece, directions)
+    def has_legal_moves(self, color: Color) -> bool:
+        color_index = COLOR_INDEX[color]
+        check_mask, pins = self._legal_masks(color_index)
+        for type_index, bitboard in enumerate(self.bitboards[color_index]):
+            for square in iter_squares(bitboard):
+                if self._legal_targets(square, type_index, color_index, check_mask, pins):
+                    return True
+        return False
     
-    def _get_rook_moves(self, pos: Position, piece: Piece) -> List[Move]:
-        directions = [(0, 1), (1, 0), (0, -1), (-1, 0)]
-        return self._get_sliding_moves(pos, piece, directions)
+    def _move_targets(self, square: int, type_index: int, color_index: int) -> int:
+        own = self.occupancy[color_index]
+        enemies = self.occupancy[1 - color_index]
+        occupied = own | enemies
+        
+        # Pseudo-legal targets are the attacked squares not held by own pieces
+        if type_index != PAWN:
+            return piece_attacks(type_index, color_index, square, occupied) & ~own
+        
+        # Forward move, plus the double move from the starting position
+        start_rank = 1 if color_index == COLOR_INDEX[Color.WHITE] else 6
+        targets = PAWN_PUSHES[color_index][square] & ~occupied
+        if targets and (square >> 3) & 7 == start_rank:
+            targets |= PAWN_PUSHES[color_index][targets.bit_length() - 1] & ~occupied
+        
+        # Capture moves
+        return targets | PAWN_ATTACKS[color_index][square] & enemies
     
-    def _get_queen_moves(self, pos: Position, piece: Piece) -> List[Move]:
-        directions = [(0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (1, -1), (-1, 1), (-1, -1)]
-        return self._get_sliding_moves(pos, piece, directions)
+    def _legal_masks(self, color_index: int) -> Tuple[int, Dict[int, int]]:
+        # Returns the squares a non-king move must land on to resolve any
+        # check, and for every pinned piece the line it may still move along.
+        # Only the in-level slider lines can be blocked or pinned; the level
+        # changes are single steps.
+        king = self.king_squares[color_index]
+        if king is None:
+            return FULL_BOARD, {}
+        
+        opponent_index = 1 - color_index
+        enemy = self.bitboards[opponent_index]
+        occupied = self.occupancy[0] | self.occupancy[1]
+        
+        checkers = attackers_to(king, enemy, opponent_index, occupied)
+        if not checkers:
+            check_mask = FULL_BOARD
+        elif checkers & (checkers - 1):
+            check_mask = 0  # Double check: only the king may move
+        else:
+            check_mask = checkers | BETWEEN[king][checkers.bit_length() - 1]
+        
+        pins = {}
+        snipers = (ORTHOGONAL_RAYS[king] & (enemy[ROOK] | enemy[QUEEN]) |
+                   DIAGONAL_RAYS[king] & (enemy[BISHOP] | enemy[QUEEN]))
+        for sniper in iter_squares(snipers):
+            line = BETWEEN[king][sniper]
+            blockers = line & occupied
+            if blockers and not blockers & (blockers - 1) and blockers & self.occupancy[color_index]:
+                pins[blockers.bit_length() - 1] = line | 1 << sniper
+        
+        return check_mask, pins
     
-    def _get_king_moves(self, pos: Position, piece: Piece) -> List[Move]:
-        moves = []
-        directions = [(0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (1, -1), (-1, 1), (-1, -1)]
-        
-        for direction in directions:
-            new_pos = Position(
-                pos.level,
-                pos.rank + direction[0],
-                pos.file + direction[1]
-            )
-            
-            if self.is_valid_position(new_pos):
-                target = self.get_piece(new_pos)
-                if not target or target.color != piece.color:
-                    moves.append(Move(pos, new_pos))
+    def _legal_targets(self, square: int, type_index: int, color_index: int,
+                       check_mask: int, pins: Dict[int, int]) -> int:
+        targets = self._move_targets(square, type_index, color_index)
         
-        return moves
+        if type_index == KING:
+            # The king may not step onto an attacked square; lift it off the
+            # board first so sliders attacking along its line see through it
+            opponent_index = 1 - color_index
+            occupied = (self.occupancy[0] | self.occupancy[1]) & ~(1 << square)
+            for target in iter_squares(targets):
+                if attackers_to(target, self.bitboards[opponent_index], opponent_index, occupied):
+                    targets &= ~(1 << target)
+            return targets
+        
+        targets &= check_mask
+        if square in pins:
+            targets &= pins[square]
+        return targets
     
-    def _get_3d_moves(self, pos: Position, piece: Piece) -> List[Move]:
-        moves = []
-        level_offsets = []
-        
-        # Define which pieces can move between levels and how
-        if piece.type == PieceType.KNIGHT:
-            # Knights can jump between adjacent levels with a modified L-move
-            if pos.level < 2:
-                level_offsets.append(1)  # Up one level
-            if pos.level > 0:
-                level_offsets.append(-1)  # Down one level
-                
-            for level_offset in level_offsets:
-                for rank_offset, file_offset in [(1, 1), (1, -1), (-1, 1), (-1, -1)]:
-                    new_pos = Position(pos.level + level_offset, pos.rank + rank_offset, pos.file + file_offset)
-                    if self.is_valid_position(new_pos):
-                        target = self.get_piece(new_pos)
-                        if not target or target.color != piece.color:
-                            moves.append(Move(pos, new_pos))
-        
-        elif piece.type == PieceType.BISHOP or piece.type == PieceType.QUEEN:
-            # Bishops and Queens can move diagonally between levels
-            if pos.level < 2:  # Can move up
-                for rank_offset, file_offset in [(1, 1), (1, -1), (-1, 1), (-1, -1)]:
-                    new_pos = Position(pos.level + 1, pos.rank + rank_offset, pos.file + file_offset)
-                    if self.is_valid_position(new_pos):
-                        target = self.get_piece(new_pos)
-                        if not target or target.color != piece.color:
-                            moves.append(Move(pos, new_pos))
-            
-            if pos.level > 0:  # Can move down
-                for rank_offset, file_offset in [(1, 1), (1, -1), (-1, 1), (-1, -1)]:
-                    new_pos = Position(pos.level - 1, pos.rank + rank_offset, pos.file + file_offset)
-                    if self.is_valid_position(new_pos):
-                        target = self.get_piece(new_pos)
-                        if not target or target.color != piece.color:
-                            moves.append(Move(pos, new_pos))
-        
-        elif piece.type == PieceType.ROOK or piece.type == PieceType.QUEEN:
-            # Rooks and Queens can move vertically between levels
-            if pos.level < 2:  # Can move up
-                new_pos = Position(pos.level + 1, pos.rank, pos.file)
-                if not self.get_piece(new_pos) or self.get_piece(new_pos).color != piece.color:
-                    moves.append(Move(pos, new_pos))
-            
-            if pos.level > 0:  # Can move down
-                new_pos = Position(pos.level - 1, pos.rank, pos.file)
-                if not self.get_piece(new_pos) or self.get_piece(new_pos).color != piece.color:
-                    moves.append(Move(pos, new_pos))
+    def _moves_to_targets(self, pos: Position, piece: Piece, targets: int) -> List[Move]:
+        if piece.type != PieceType.PAWN:
+            return [Move(pos, square_position(target)) for target in iter_squares(targets)]
         
+        moves = []
+        promotion_rank = 7 if piece.color == Color.WHITE else 0
+        for target in iter_squares(targets):
+            new_pos = square_position(target)
+            if new_pos.rank == promotion_rank:
+                for promotion_type in PROMOTION_TYPES:
+                    moves.append(Move(pos, new_pos, promotion_type))
+            else:
+                moves.append(Move(pos, new_pos))
         return moves
     
+    def attack_maps(self) -> np.ndarray:
+        # Read-only (2, 3, 8, 8) int16 counts of the white and black pieces
+        # attacking each square, cached for the current position
+        if self._attack_maps_key != self.hash_key:
+            maps = attack_count_maps(self.board)
+            maps.flags.writeable = False
+            self._attack_maps = maps
+            self._attack_maps_key = self.hash_key
+        return self._attack_maps
+    
+    def is_square_attacked(self, pos: Position, by_color: Color) -> bool:
+        color_index = COLOR_INDEX[by_color]
+        return bool(attackers_to(pos.index,
+                                 self.bitboards[color_index], color_index,
+                                 self.occupancy[0] | self.occupancy[1]))
+    
     def is_check(self, color: Color) -> bool:
-        king_pos = None
-        
-        # Find the king
-        for level in range(3):
-            for rank in range(8):
-                for file in range(8):
-                    piece = self.board[level, rank, file]
-                    if piece and piece.type == PieceType.KING and piece.color == color:
-                        king_pos = Position(level, rank, file)
-                        break
-                if king_pos:
-                    break
-            if king_pos:
-                break
-        
-        if not king_pos:
+        king_square = self.king_squares[COLOR_INDEX[color]]
+        if king_square is None:
             return False
         
         # Check if any opponent piece can capture the king
-        opponent_color = Color.BLACK if color == Color.WHITE else Color.WHITE
+        opponent_index = 1 - COLOR_INDEX[color]
+        return bool(attackers_to(king_square, self.bitboards[opponent_index],
+                                 opponent_index, self.occupancy[0] | self.occupancy[1]))
+    
+    def is_checkmate(self, color: Color) -> bool:
+        return self.is_check(color) and not self.has_legal_moves(color)
+    
+    def status(self) -> GameStatus:
+        # Check, mate and draw state of the side to move. The result is
+        # cached per position: every make, unmake, reset or edit changes the
+        # hash key or the history length, so repeated calls while the game
+        # is idle (e.g. once per rendered frame) cost a tuple comparison.
+        key = (self.hash_key, len(self.move_history))
+        if self._status_key == key:
+            return self._status
         
-        for level in range(3):
-            for rank in range(8):
-                for file in range(8):
-                    pos = Position(level, rank, file)
-                    piece = self.get_piece(pos)
-                    if piece and piece.color == opponent_color:
-                        for move in self.get_valid_moves(pos):
-                            if move.to_pos == king_pos:
-                                return True
+        color = self.current_player
+        check = self.is_check(color)
+        has_moves = self.has_legal_moves(color)
+        checkmate = check and not has_moves
+        draw_reason = None
+        if not has_moves and not check:
+            draw_reason = "stalemate"
+        elif checkmate:
+            pass
+        elif self.halfmove_clock >= 100:
+            draw_reason = "fifty-move rule"
+        elif self._repetitions() >= 3:
+            draw_reason = "repetition"
+        elif not any(self.bitboards[0][:KING] + self.bitboards[1][:KING]):
+            draw_reason = "insufficient material"
         
-        return False
+        winner = None
+        if checkmate:
+            winner = Color.BLACK if color == Color.WHITE else Color.WHITE
+        self._status = GameStatus(check, checkmate, draw_reason == "stalemate",
+                                  draw_reason is not None, draw_reason, winner)
+        self._status_key = key
+        return self._status
     
-    def is_checkmate(self, color: Color) -> bool:
-        if not self.is_check(color):
-            return False
+    def _repetitions(self) -> int:
+        # Occurrences of the current position since the last capture or pawn
+        # move, found through the hash keys saved in the undo records
+        count = 1
+        history = self.move_history
+        for i in range(len(history) - 2, max(len(history) - self.halfmove_clock, 0) - 1, -2):
+            if history[i][3] == self.hash_key:
+                count += 1
+        return count
+    
+    def perft(self, depth: int) -> int:
+        # Number of leaf nodes of the legal move tree, for validating and
+        # benchmarking the move generator
+        if depth <= 0:
+            return 1
+        return self._perft(depth, 0)
+    
+    def perft_divide(self, depth: int) -> Dict[Move, int]:
+        # Leaf counts below each root move; none at depth 0, where no root
+        # move is played
+        counts = {}
+        if depth <= 0:
+            return counts
+        for move in list(self.generate_moves(self.current_player)):
+            self.make_move_unchecked(move)
+            counts[Move.decode(move)] = self._perft(depth - 1, 1) if depth > 1 else 1
+            self.unmake_move()
+        return counts
+    
+    def _perft(self, depth: int, ply: int) -> int:
+        moves = self.generate_moves(self.current_player, ply=ply)
+        if depth == 1:
+            return len(moves)
+        
+        nodes = 0
+        for move in moves:
+            self.make_move_unchecked(move)
+            nodes += self._perft(depth - 1, ply + 1)
+            self.unmake_move()
+        return nodes
+    
+    def verify_move_generation(self, depth: int) -> Optional[str]:
+        # Walks the tree comparing generate_moves with get_valid_moves
+        # filtered by playing each move and testing is_check. Returns a
+        # description of the first mismatch, or None.
+        color = self.current_player
+        reference = set()
+        for pos, piece in self.pieces(color):
+            for move in self.get_valid_moves(pos):
+                packed = move.encode()
+                self.make_move_unchecked(packed)
+                if not self.is_check(color):
+                    reference.add(packed)
+                self.unmake_move()
+        
+        generated = [move & MOVE_KEY_MASK for move in self.generate_moves(color, ply=depth)]
+        if len(generated) != len(reference) or set(generated) != reference:
+            line = " ".join(str(Move.decode(entry[0])) for entry in self.move_history)
+            missing = sorted(map(str, map(Move.decode, reference.difference(generated))))
+            extra = sorted(map(str, map(Move.decode, set(generated).difference(reference))))
+            return f"after [{line}]: missing {missing}, unexpected {extra}"
+        
+        if depth > 1:
+            for move in generated:
+                self.make_move_unchecked(move)
+                mismatch = self.verify_move_generation(depth - 1)
+                self.unmake_move()
+                if mismatch:
+                    return mismatch
+        return None
+    
+    def perft_parallel(self, depth: int, workers: Optional[int] = None, split_depth: int = 1,
+                       hashed: bool = False, hash_mb: int = 16) -> Dict[Move, int]:
+        # perft_divide spread over a process pool. The tree is split
+        # `split_depth` plies below the root, each subtree is shipped as a
+        # to_bytes() encoding and the counts are merged per root move. With
+        # `hashed`, each worker also keeps a transposition table of subtree
+        # counts keyed by hash key and depth, of about `hash_mb` megabytes
+        # per worker. At depth 0 no root move is played, so there are no
+        # rows; perft(0) counts the root itself.
+        import os
+        from concurrent.futures import ProcessPoolExecutor
+        
+        if depth <= 0:
+            return {}
+        split_depth = max(1, min(split_depth, depth))
+        tasks = []
+        self._collect_perft_tasks(split_depth, depth, None, 0, tasks)
         
-        # Try all possible moves to see if any can get out of check
+        # Every root move gets a row, including those whose subtree ends
+        # before the split depth and so produced no task
+        counts = {move & MOVE_KEY_MASK: 0 for move in self.generate_moves(self.current_player)}
+        if tasks:
+            roots, jobs = zip(*tasks)
+            table_entries = max(1, hash_mb * (1 << 20) // PERFT_ENTRY_BYTES) if hashed else 0
+            with ProcessPoolExecutor(max_workers=workers, initializer=_perft_worker_init,
+                                     initargs=(table_entries,)) as executor:
+                chunksize = max(1, len(jobs) // (4 * (workers or os.cpu_count() or 1)))
+                for root, nodes in zip(roots, executor.map(_perft_task, jobs, chunksize=chunksize)):
+                    counts[root] = counts.get(root, 0) + nodes
+        return {Move.decode(root): nodes for root, nodes in counts.items()}
+    
+    def _collect_perft_tasks(self, split_depth: int, depth: int, root: Optional[int],
+                             ply: int, tasks: list):
+        for move in self.generate_moves(self.current_player, ply=ply):
+            self.make_move_unchecked(move)
+            move_root = move & MOVE_KEY_MASK if root is None else root
+            if split_depth == 1:
+                tasks.append((move_root, (self.to_bytes(), depth - 1)))
+            else:
+                self._collect_perft_tasks(split_depth - 1, depth - 1, move_root, ply + 1, tasks)
+            self.unmake_move()
+    
+    def _perft_hashed(self, depth: int, ply: int, table: Dict[int, int], entries: int) -> int:
+        key = self.hash_key ^ ZOBRIST_DEPTH[depth]
+        nodes = table.get(key)
+        if nodes is not None:
+            return nodes
+        
+        moves = self.generate_moves(self.current_player, ply=ply)
+        if depth == 1:
+            nodes = len(moves)
+        else:
+            nodes = 0
+            for move in moves:
+                self.make_move_unchecked(move)
+                nodes += self._perft_hashed(depth - 1, ply + 1, table, entries)
+                self.unmake_move()
+        
+        if len(table) >= entries:
+            table.clear()
+        table[key] = nodes
+        return nodes
+    
+    def to_bytes(self) -> bytes:
+        # Compact position encoding: the 192 mailbox codes and the side to move
+        return bytes(self.squares) + bytes([COLOR_INDEX[self.current_player]])
+    
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Chess3D':
+        game = cls._empty()
+        for square, code in enumerate(data[:192]):
+            if code:
+                game._set_square(square, code)
+        if data[192] == COLOR_INDEX[Color.BLACK]:
+            game.current_player = Color.BLACK
+            game.hash_key ^= ZOBRIST_BLACK_TO_MOVE
+        return game
+    
+    def to_fen(self) -> str:
+        squares = self.squares.translate(_FEN_TRANSLATION).decode()
+        levels = []
         for level in range(3):
-            for rank in range(8):
-                for file in range(8):
-                    pos = Position(level, rank, file)
-                    piece = self.get_piece(pos)
-                    if piece and piece.color == color:
-                        for move in self.get_valid_moves(pos):
-                            # Try the move
-                            captured_piece = self.get_piece(move.to_pos)
-                            self.set_piece(move.to_pos, piece)
-                            self.set_piece(pos, None)
-                            
-                            # Check if still in check
-                            still_in_check = self.is_check(color)
-                            
-                            # Undo the move
-                            self.set_piece(pos, piece)
-                            self.set_piece(move.to_pos, captured_piece)
-                            
-                            if not still_in_check:
-                                return False
+            base = level * 64
+            ranks = [squares[base + rank * 8:base + rank * 8 + 8] for rank in range(7, -1, -1)]
+            levels.append(_FEN_EMPTY_RUN.sub(lambda run: str(len(run.group())), "/".join(ranks)))
+        side = "w" if self.current_player == Color.WHITE else "b"
+        return f"{'|'.join(levels)} {side} {self.halfmove_clock} {self.fullmove_number}"
+    
+    @classmethod
+    def from_fen(cls, fen: str) -> 'Chess3D':
+        # Inverse of to_fen; the counters may be omitted
+        fields = fen.split()
+        if not 2 <= len(fields) <= 4 or fields[1] not in ("w", "b"):
+            raise ValueError(f"invalid 3D FEN: {fen!r}")
+        levels = fields[0].split("|")
+        if len(levels) != 3:
+            raise ValueError(f"3D FEN needs three levels: {fen!r}")
         
-        return True
+        game = cls._empty()
+        for level, level_text in enumerate(levels):
+            ranks = level_text.split("/")
+            if len(ranks) != 8:
+                raise ValueError(f"3D FEN level needs eight ranks: {fen!r}")
+            for rank, rank_text in zip(range(7, -1, -1), ranks):
+                square = level * 64 + rank * 8
+                end = square + 8
+                for char in rank_text:
+                    if char in "12345678":
+                        square += int(char)
+                    elif char in FEN_CODES and square < end:
+                        game._set_square(square, FEN_CODES[char])
+                        square += 1
+                    else:
+                        raise ValueError(f"invalid 3D FEN rank {rank_text!r}: {fen!r}")
+                if square != end:
+                    raise ValueError(f"invalid 3D FEN rank {rank_text!r}: {fen!r}")
+        
+        if fields[1] == "b":
+            game.current_player = Color.BLACK
+            game.hash_key ^= ZOBRIST_BLACK_TO_MOVE
+        try:
+            if len(fields) > 2:
+                game.halfmove_clock = int(fields[2])
+            if len(fields) > 3:
+                game.fullmove_number = int(fields[3])
+        except ValueError:
+            raise ValueError(f"invalid 3D FEN counters: {fen!r}") from None
+        return game
     
     def get_board_state(self) -> Dict:
         pieces = {}
-        for level in range(3):
-            for rank in range(8):
-                for file in range(8):
-                    piece = self.board[level, rank, file]
-                    if piece:
-                        pos = Position(level, rank, file)
-                        pieces[str(pos)] = str(piece)
+        for square in iter_squares(self.occupancy[0] | self.occupancy[1]):
+            pos = square_position(square)
+            pieces[str(pos)] = str(self.get_piece(pos))
         
         return {
             "pieces": pieces,
             "current_player": self.current_player.name,
             "move_count": len(self.move_history)
         }
+
+
+# Transposition table of each perft worker process, bounded by entry count.
+# An entry (int key, int count and its dict slot) takes about this many bytes.
+PERFT_ENTRY_BYTES = 128
+_perft_table = {}
+_perft_table_entries = 0
+
+def _perft_worker_init(table_entries: int):
+    global _perft_table_entries
+    _perft_table_entries = table_entries
+
+def _perft_task(job: Tuple[bytes, int]) -> int:
+    data, depth = job
+    if depth <= 0:
+        return 1
+    game = Chess3D.from_bytes(data)
+    if _perft_table_entries:
+        return game._perft_hashed(depth, 0, _perft_table, _perft_table_entries)
+    return game._perft(depth, 0)
+
+def main(argv=None):
+    import argparse
+    import time
+    
+    parser = argparse.ArgumentParser(description="3D chess move generator perft")
+    parser.add_argument("depth", type=int, help="search depth in plies")
+    parser.add_argument("--fen", help="start from this 3D FEN position instead of the initial one")
+    parser.add_argument("--moves", default="",
+                        help="space-separated moves from the start position, e.g. \"Ae2->Ae4 Cd7->Cd5\"")
+    parser.add_argument("--divide", action="store_true", help="print the leaf count below each root move")
+    parser.add_argument("--verify", action="store_true",
+                        help="check the generator against get_valid_moves before counting")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="split the tree over this many processes (0: single process)")
+    parser.add_argument("--split-depth", type=int, default=1,
+                        help="plies below the root at which the tree is split between workers")
+    parser.add_argument("--hash", action="store_true",
+                        help="let each worker reuse counts of transposed subtrees")
+    parser.add_argument("--hash-mb", type=int, default=16,
+                        help="size of each worker's subtree table in megabytes (with --hash)")
+    args = parser.parse_args(argv)
+    
+    try:
+        game = Chess3D.from_fen(args.fen) if args.fen else Chess3D()
+    except ValueError as error:
+        parser.error(str(error))
+    for text in args.moves.split():
+        try:
+            move = Move.from_string(text)
+        except ValueError as error:
+            parser.error(str(error))
+        if not game.make_move(move):
+            parser.error(f"illegal move: {text}")
+    
+    if args.verify:
+        mismatch = game.verify_move_generation(args.depth)
+        if mismatch:
+            print(f"Move generation mismatch {mismatch}")
+            return 1
+        print(f"Move generation verified to depth {args.depth}")
+    
+    start = time.perf_counter()
+    if args.depth <= 0:
+        nodes = game.perft(args.depth)
+    elif args.workers > 0:
+        counts = game.perft_parallel(args.depth, args.workers, args.split_depth, args.hash,
+                                     args.hash_mb)
+        if args.divide:
+            for move, count in sorted(counts.items(), key=lambda item: str(item[0])):
+                print(f"{move}: {count}")
+        nodes = sum(counts.values())
+    elif args.divide:
+        counts = game.perft_divide(args.depth)
+        for move, count in sorted(counts.items(), key=lambda item: str(item[0])):
+            print(f"{move}: {count}")
+        nodes = sum(counts.values())
+    else:
+        nodes = game.perft(args.depth)
+    elapsed = time.perf_counter() - start
+    
+    print(f"Nodes: {nodes}")
+    print(f"Time: {elapsed:.3f}s")
+    print(f"Nodes/sec: {nodes / elapsed:.0f}" if elapsed > 0 else "Nodes/sec: n/a")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
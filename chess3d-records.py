@@ -0,0 +1,195 @@
+import mmap
+import struct
+import sys
+from array import array
+from typing import Iterable, Iterator, Tuple
+
+import numpy as np
+
+from chess3d import Chess3D, COLOR_INDEX, MOVE_KEY_MASK
+
+# Binary storage for large position and game collections. All integers are
+# little-endian and records are multiples of 4 bytes, so files can be
+# memory-mapped and sliced without copying.
+#
+# Position record (104 bytes): the 192 mailbox piece codes as nibbles, two
+# squares per byte with the lower square in the low nibble, then side to
+# move (0 white, 1 black), a reserved byte, halfmove clock and fullmove
+# number.
+POSITION_RECORD = struct.Struct("<96sBxHI")
+POSITION_RECORD_SIZE = POSITION_RECORD.size
+
+# Game record: header (magic, number of moves), the position record of the
+# start position, then one uint32 per move in the packed move encoding.
+GAME_MAGIC = b"C3DG"
+GAME_HEADER = struct.Struct("<4sI")
+MOVE_SIZE = 4
+
+def pack_squares(squares: bytes) -> bytes:
+    codes = np.frombuffer(squares, dtype=np.uint8)
+    return (codes[0::2] | codes[1::2] << 4).tobytes()
+
+def unpack_squares(packed: bytes) -> bytes:
+    nibbles = np.frombuffer(packed, dtype=np.uint8)
+    codes = np.empty(192, dtype=np.uint8)
+    codes[0::2] = nibbles & 0xF
+    codes[1::2] = nibbles >> 4
+    return codes.tobytes()
+
+def pack_position(game: Chess3D) -> bytes:
+    return POSITION_RECORD.pack(pack_squares(game.squares), COLOR_INDEX[game.current_player],
+                                game.halfmove_clock, game.fullmove_number)
+
+def unpack_position(record: bytes) -> Chess3D:
+    packed, side, halfmove_clock, fullmove_number = POSITION_RECORD.unpack(record)
+    if side > 1:
+        raise ValueError(f"invalid side to move in position record: {side}")
+    game = Chess3D.from_bytes(unpack_squares(packed) + bytes([side]))
+    game.halfmove_clock = halfmove_clock
+    game.fullmove_number = fullmove_number
+    return game
+
+def _start_record(game: Chess3D) -> bytes:
+    # Position record of the game's start, rebuilt from the undo records
+    # without unmaking any moves
+    history = game.move_history
+    if not history:
+        return pack_position(game)
+    squares = bytearray(game.squares)
+    for move, captured, moved, _, _ in reversed(history):
+        squares[move & 0xFF] = moved
+        squares[move >> 8 & 0xFF] = captured
+    side = COLOR_INDEX[game.current_player] ^ (len(history) & 1)
+    # Fullmove numbers advance after each black move
+    black_moves = (len(history) + side) // 2
+    return POSITION_RECORD.pack(pack_squares(squares), side, history[0][4],
+                                game.fullmove_number - black_moves)
+
+def pack_game(game: Chess3D) -> bytes:
+    moves = array('I', [entry[0] & MOVE_KEY_MASK for entry in game.move_history])
+    if sys.byteorder == "big":
+        moves.byteswap()
+    return GAME_HEADER.pack(GAME_MAGIC, len(moves)) + _start_record(game) + moves.tobytes()
+
+def _replay(start_record: bytes, packed_moves: bytes) -> Chess3D:
+    # Replays the stored moves, so the returned game can be unmade back to
+    # its start position
+    game = unpack_position(start_record)
+    moves = array('I')
+    moves.frombytes(packed_moves)
+    if sys.byteorder == "big":
+        moves.byteswap()
+    for move in moves:
+        game.make_move_unchecked(move)
+    return game
+
+def unpack_game(record: bytes) -> Chess3D:
+    magic, count = GAME_HEADER.unpack_from(record)
+    if magic != GAME_MAGIC:
+        raise ValueError("not a game record")
+    start = GAME_HEADER.size
+    moves = start + POSITION_RECORD_SIZE
+    if len(record) < moves + count * MOVE_SIZE:
+        raise ValueError("truncated game record")
+    return _replay(record[start:moves], record[moves:moves + count * MOVE_SIZE])
+
+def write_positions(path: str, games: Iterable[Chess3D]) -> int:
+    count = 0
+    with open(path, "wb") as stream:
+        for game in games:
+            stream.write(pack_position(game))
+            count += 1
+    return count
+
+def write_games(path: str, games: Iterable[Chess3D]) -> int:
+    count = 0
+    with open(path, "wb") as stream:
+        for game in games:
+            stream.write(pack_game(game))
+            count += 1
+    return count
+
+class _MappedFile:
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        try:
+            # mmap cannot map an empty file
+            if self._file.seek(0, 2):
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._data = memoryview(self._map)
+            else:
+                self._map = None
+                self._data = memoryview(b"")
+        except Exception:
+            self._file.close()
+            raise
+
+    def close(self):
+        self._data.release()
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # Raw record views are still alive; the mapping is unmapped
+                # once the last of them is released
+                pass
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class PositionReader(_MappedFile):
+    # Random access to a file of position records. Records are only decoded
+    # when a position is requested; iter_raw() yields the undecoded bytes.
+    def __init__(self, path: str):
+        super().__init__(path)
+        if len(self._data) % POSITION_RECORD_SIZE:
+            self.close()
+            raise ValueError(f"{path} is not a position record file")
+
+    def __len__(self) -> int:
+        return len(self._data) // POSITION_RECORD_SIZE
+
+    def raw(self, index: int) -> memoryview:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("position record index out of range")
+        start = index * POSITION_RECORD_SIZE
+        return self._data[start:start + POSITION_RECORD_SIZE]
+
+    def __getitem__(self, index: int) -> Chess3D:
+        return unpack_position(self.raw(index))
+
+    def iter_raw(self) -> Iterator[memoryview]:
+        for start in range(0, len(self._data), POSITION_RECORD_SIZE):
+            yield self._data[start:start + POSITION_RECORD_SIZE]
+
+    def __iter__(self) -> Iterator[Chess3D]:
+        for record in self.iter_raw():
+            yield unpack_position(record)
+
+class GameReader(_MappedFile):
+    # Sequential access to a file of game records. iter_raw() walks the
+    # headers only and yields (start position record, packed moves) views.
+    def iter_raw(self) -> Iterator[Tuple[memoryview, memoryview]]:
+        data = self._data
+        offset = 0
+        while offset < len(data):
+            magic, count = GAME_HEADER.unpack_from(data, offset)
+            if magic != GAME_MAGIC:
+                raise ValueError(f"corrupt game record at offset {offset}")
+            start = offset + GAME_HEADER.size
+            moves = start + POSITION_RECORD_SIZE
+            offset = moves + count * MOVE_SIZE
+            if offset > len(data):
+                raise ValueError(f"truncated game record at offset {start - GAME_HEADER.size}")
+            yield data[start:moves], data[moves:offset]
+
+    def __iter__(self) -> Iterator[Chess3D]:
+        for start, moves in self.iter_raw():
+            yield _replay(start, moves)
@@ -19,6 +19,7 @@ class Chess3DRenderer:
         self.game = Chess3D()
         self.selected_pos = None
         self.valid_moves = []
+        self.show_threats = False
         self.running = True
         
         # Asset loading and caching
@@ -148,6 +149,10 @@ class Chess3DRenderer:
         for level in range(3):
             self.draw_level(level)
         
+        # Draw squares attacked by the opponent of the side to move
+        if self.show_threats:
+            self.draw_threats()
+        
         # Draw selection highlight
         if self.selected_pos:
             self.draw_selection()
@@ -213,6 +218,23 @@ class Chess3DRenderer:
         pygame.draw.polygon(s, (255, 255, 0, 128), corners)
         self.screen.blit(s, (0, 0))
 
+    def draw_threats(self):
+        """Shade squares attacked by the opponent, darker for more attackers"""
+        opponent = 1 if self.game.current_player == Color.WHITE else 0
+        counts = self.game.attack_maps()[opponent]
+        
+        s = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
+        for level, rank, file in zip(*counts.nonzero()):
+            corners = [
+                self.to_isometric(file, rank, level),
+                self.to_isometric(file + 1, rank, level),
+                self.to_isometric(file + 1, rank + 1, level),
+                self.to_isometric(file, rank + 1, level),
+            ]
+            alpha = min(200, 60 * int(counts[level, rank, file]))
+            pygame.draw.polygon(s, (255, 0, 0, alpha), corners)
+        self.screen.blit(s, (0, 0))
+
     def draw_valid_move(self, move):
         """Highlight a valid move destination"""
         level, rank, file = move.to_pos.level, move.to_pos.rank, move.to_pos.file
@@ -231,21 +253,17 @@ class Chess3DRenderer:
         turn_surface = font.render(turn_text, True, (255, 255, 255))
         self.screen.blit(turn_surface, (20, 20))
         
-        # Check for check/checkmate
-        white_in_check = self.game.is_check(Color.WHITE)
-        black_in_check = self.game.is_check(Color.BLACK)
-        white_in_checkmate = self.game.is_checkmate(Color.WHITE)
-        black_in_checkmate = self.game.is_checkmate(Color.BLACK)
+        # Check for check/checkmate; status() is cached between moves
+        status = self.game.status()
+        side = 'White' if self.game.current_player == Color.WHITE else 'Black'
         
         status_text = ""
-        if white_in_checkmate:
-            status_text = "Black wins by checkmate!"
-        elif black_in_checkmate:
-            status_text = "White wins by checkmate!"
-        elif white_in_check:
-            status_text = "White is in check!"
-        elif black_in_check:
-            status_text = "Black is in check!"
+        if status.checkmate:
+            status_text = f"{'White' if status.winner == Color.WHITE else 'Black'} wins by checkmate!"
+        elif status.draw:
+            status_text = f"Draw by {status.draw_reason}!"
+        elif status.check:
+            status_text = f"{side} is in check!"
             
         if status_text:
             status_surface = font.render(status_text, True, (255, 100, 100))
@@ -253,7 +271,7 @@ class Chess3DRenderer:
             
         # Draw help text
         help_font = pygame.font.SysFont("arial", 16)
-        help_text = "Click to select and move pieces | Esc: New Game | U: Undo"
+        help_text = "Click to select and move pieces | Esc: New Game | U: Undo | H: Threats"
         help_surface = help_font.render(help_text, True, (200, 200, 200))
         self.screen.blit(help_surface, (20, self.height - 30))
 
@@ -269,7 +287,7 @@ class Chess3DRenderer:
             piece = self.game.get_piece(click_pos)
             if piece and piece.color == self.game.current_player:
                 self.selected_pos = click_pos
-                self.valid_moves = self.game.get_valid_moves(click_pos)
+                self.valid_moves = self.game.get_legal_moves(click_pos)
         else:
             # If a piece is already selected, try to move it
             for move in self.valid_moves:
@@ -283,7 +301,7 @@ class Chess3DRenderer:
             piece = self.game.get_piece(click_pos)
             if piece and piece.color == self.game.current_player:
                 self.selected_pos = click_pos
-                self.valid_moves = self.game.get_valid_moves(click_pos)
+                self.valid_moves = self.game.get_legal_moves(click_pos)
             else:
                 # Clicking elsewhere deselects
                 self.selected_pos = None
@@ -308,6 +326,8 @@ class Chess3DRenderer:
                         self.game.undo_move()
                         self.selected_pos = None
                         self.valid_moves = []
+                    elif event.key == pygame.K_h:  # Toggle threat overlay
+                        self.show_threats = not self.show_threats
             
             # Draw everything
             self.draw_board()
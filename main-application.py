@@ -108,6 +108,9 @@ class Chess3DApplication:
                         self.game.undo_move()
                     self.renderer.selected_pos = None
                     self.renderer.valid_moves = []
+                elif event.key == pygame.K_h:
+                    # Toggle threat overlay
+                    self.renderer.show_threats = not self.renderer.show_threats
                 elif event.key == pygame.K_a:
                     # Toggle AI
                     self.toggle_ai()
@@ -143,11 +146,12 @@ class Chess3DApplication:
         
     def update_status(self):
         """Update and display game status"""
-        # Check for game end conditions
-        if self.game.is_checkmate(Color.WHITE):
-            print("Black wins by checkmate!")
-        elif self.game.is_checkmate(Color.BLACK):
-            print("White wins by checkmate!")
+        # Check for game end conditions; status() is cached between moves
+        status = self.game.status()
+        if status.checkmate:
+            print(f"{'White' if status.winner == Color.WHITE else 'Black'} wins by checkmate!")
+        elif status.draw:
+            print(f"Draw by {status.draw_reason}!")
         
     def run(self):
         """Main application loop"""